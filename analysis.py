@@ -0,0 +1,187 @@
+from collections import deque
+from typing import NamedTuple
+
+
+class Analysis(NamedTuple):
+    """
+    Outcome of `analyze`, by direction.
+
+    reachable holds the states a run can reach from its start state, doomed
+    the states from which no final state can be reached any more, and dead
+    the rules that can never fire, as (fromState, inputChar, stackChar).
+    All three ignore the stack and the input, so reachable and the rules
+    that are not dead are over-approximations: a doomed state really cannot
+    accept and a dead rule really never fires.
+    """
+
+    reachable: dict[str, frozenset[str]]
+    doomed: dict[str, frozenset[str]]
+    dead: dict[str, list[tuple[str, str, str]]]
+
+
+def _covers(earlier, later):
+    """
+    Tell whether every configuration matched by rule key `later` is also
+    matched by `earlier`, which `PDA.step` tries first.
+    """
+    return all(e == "" or (e == l and l != "") for e, l in zip(earlier, later))
+
+
+def shadowed_rules(dir_transitions):
+    """
+    Return the (fromState, (inputChar, stackChar)) keys of the rules that can
+    never be picked because an earlier rule of the same state matches every
+    configuration they match. Several earlier rules can never cover a rule
+    together, as none of them matches an empty stack or the end of the input
+    unless it matches on its own.
+
+    >>> sorted(shadowed_rules({
+    ...     "q0": {("a", ""): ("q1", ""), ("a", "X"): ("q2", ""), ("", "X"): ("q3", "")},
+    ... }))
+    [('q0', ('a', 'X'))]
+    """
+    shadowed = set()
+    for from_state, transitions_for_state in dir_transitions.items():
+        keys = list(transitions_for_state)
+        for index, key in enumerate(keys):
+            if any(_covers(earlier, key) for earlier in keys[:index]):
+                shadowed.add((from_state, key))
+    return shadowed
+
+
+def reachable_states(dir_transitions, start, skip=frozenset()):
+    """
+    Return the states reachable from `start` through the rules of one
+    direction, leaving out the (fromState, key) rules in `skip`.
+
+    >>> sorted(reachable_states({"q0": {("a", ""): ("q1", "")}, "q2": {("a", ""): ("q0", "")}}, "q0"))
+    ['q0', 'q1']
+    """
+    reached = {start}
+    queue = deque([start])
+    while queue:
+        state = queue.popleft()
+        for key, (to_state, _) in dir_transitions.get(state, {}).items():
+            if to_state not in reached and (state, key) not in skip:
+                reached.add(to_state)
+                queue.append(to_state)
+    return frozenset(reached)
+
+
+def doomed_states(dir_transitions, final_states, skip=frozenset()):
+    """
+    Return the states of one direction from which no state in `final_states` can be reached.
+
+    >>> sorted(doomed_states({"q0": {("a", ""): ("q1", ""), ("b", ""): ("q2", "")}, "q2": {("", ""): ("q2", "")}}, ["q1"]))
+    ['q2']
+    """
+    predecessors = {}
+    states = set()
+    for from_state, transitions_for_state in dir_transitions.items():
+        states.add(from_state)
+        for key, (to_state, _) in transitions_for_state.items():
+            states.add(to_state)
+            if (from_state, key) not in skip:
+                predecessors.setdefault(to_state, set()).add(from_state)
+
+    alive = set(state for state in final_states)
+    queue = deque(alive)
+    while queue:
+        state = queue.popleft()
+        for from_state in predecessors.get(state, ()):
+            if from_state not in alive:
+                alive.add(from_state)
+                queue.append(from_state)
+    return frozenset(states - alive)
+
+
+def analyze(transitions, start_states, final_states):
+    """
+    Analyze every direction of a machine without running it.
+
+    Args:
+        transitions (dict): The PDA transitions, as returned by `utils.parse_transitions`.
+        start_states (dict[str, str]): The state runs in each direction start from.
+        final_states (dict[str, Iterable[str]]): The accepting states of runs in each direction.
+    """
+    reachable = {}
+    doomed = {}
+    dead = {}
+    for direction, dir_transitions in transitions.items():
+        shadowed = shadowed_rules(dir_transitions)
+        reached = reachable_states(dir_transitions, start_states[direction], shadowed)
+        reachable[direction] = reached
+        doomed[direction] = doomed_states(
+            dir_transitions, final_states[direction], shadowed
+        )
+        dead[direction] = [
+            (from_state, *key)
+            for from_state, transitions_for_state in dir_transitions.items()
+            for key in transitions_for_state
+            if from_state not in reached or (from_state, key) in shadowed
+        ]
+    return Analysis(reachable, doomed, dead)
+
+
+def _partner(transitions, direction, from_state, key, rule):
+    """
+    Return the (direction, fromState, key) of the rule that undoes a rule, if the machine has it.
+    """
+    other = "b" if direction == "f" else "f"
+    (input_char, stack_char), (to_state, stack_change) = key, rule
+    reverse_key = (input_char, stack_change)
+    if transitions.get(other, {}).get(to_state, {}).get(reverse_key) == (
+        from_state,
+        stack_char,
+    ):
+        return (other, to_state, reverse_key)
+    return None
+
+
+def minimize(transitions, analysis):
+    """
+    Return a copy of `transitions` without the dead rules found by `analyze`,
+    and the number of rules removed. A rule and the rule of the other
+    direction that undoes it (see `utils.validation_report`) are only removed
+    together, when both are dead, so a reversible machine stays reversible
+    and runs in either direction behave exactly as before. States left
+    without rules disappear from the compiled table.
+
+    >>> transitions = {
+    ...     "f": {
+    ...         "q0": {("a", ""): ("q1", "X")},
+    ...         "q5": {("a", ""): ("q6", "X")},
+    ...     },
+    ...     "b": {
+    ...         "q1": {("a", "X"): ("q0", "")},
+    ...         "q6": {("a", "X"): ("q5", "")},
+    ...     },
+    ... }
+    >>> analysis = analyze(transitions, {"f": "q0", "b": "q1"}, {"f": ["q1"], "b": ["q0"]})
+    >>> sorted(analysis.reachable["f"]), analysis.dead["f"]
+    (['q0', 'q1'], [('q5', 'a', '')])
+    >>> minimize(transitions, analysis)
+    ({'f': {'q0': {('a', ''): ('q1', 'X')}}, 'b': {'q1': {('a', 'X'): ('q0', '')}}}, 2)
+    """
+    dead = {
+        (direction, from_state, (input_char, stack_char))
+        for direction, rules in analysis.dead.items()
+        for from_state, input_char, stack_char in rules
+    }
+    minimized = {}
+    removed = 0
+    for direction, dir_transitions in transitions.items():
+        minimized[direction] = {}
+        for from_state, transitions_for_state in dir_transitions.items():
+            kept = {}
+            for key, rule in transitions_for_state.items():
+                partner = _partner(transitions, direction, from_state, key, rule)
+                if (direction, from_state, key) in dead and (
+                    partner is None or partner in dead
+                ):
+                    removed += 1
+                else:
+                    kept[key] = rule
+            if kept:
+                minimized[direction][from_state] = kept
+    return minimized, removed
@@ -0,0 +1,170 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from machine import Machine
+
+# Inputs simulated per call in lockstep: enough rows to amortize the
+# per-iteration overhead of the NumPy operations
+LOCKSTEP_CHUNKSIZE = 4096
+
+# Per-worker runs by direction, started once by _init_worker and reused for every input
+_worker_runs = {}
+
+
+def machine_runs(machine, pda_options):
+    """
+    Start a run of `machine` per direction, set up as `Machine.for_direction` says.
+    """
+    return {
+        direction: machine.for_direction(direction).run(**pda_options)
+        for direction in ("f", "b")
+    }
+
+
+def _init_worker(machine, pda_options):
+    _worker_runs.clear()
+    _worker_runs.update(machine_runs(machine, pda_options))
+
+
+def _simulate_chunk(input_strings, direction, lockstep=False, usage=False):
+    """
+    Simulate every input string in the chunk on this worker's runs.
+    """
+    return simulate_inputs(_worker_runs, input_strings, direction, lockstep, usage)
+
+
+def simulate_inputs(runs, input_strings, direction, lockstep=False, usage=False):
+    """
+    Simulate every input string on the run for `direction` from `machine_runs`.
+    Backward runs read the input reversed, as `rePDAsim.py` does. With
+    `usage`, each result also has the input characters read and the steps taken.
+    """
+    run = runs[direction]
+    if lockstep:
+        from lockstep import simulate_lockstep
+
+        if direction == "b":
+            input_strings = [input_string[::-1] for input_string in input_strings]
+        return simulate_lockstep(
+            run.table,
+            input_strings,
+            direction,
+            run.machine.initial_state,
+            run.final_states,
+            run.max_steps,
+            run.max_stack,
+            run.machine.stop_states(direction, run.reject_early, run.accept_early),
+            run.accept_early,
+            usage,
+            run.machine.lockstep_table(direction),
+        )
+    results = []
+    for input_string in input_strings:
+        if direction == "b":
+            input_string = input_string[::-1]
+        run.reset()
+        result = run.simulate(input_string, direction)
+        if usage:
+            result += (run.position, run.steps)
+        results.append(result)
+    return results
+
+
+def chunked(iterable, size):
+    """
+    Yield the items of `iterable` in lists of up to `size`.
+    """
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def simulate_many(
+    machine_file,
+    inputs,
+    direction,
+    workers=None,
+    chunksize=256,
+    use_cache=True,
+    cache_dir=None,
+    minimize=False,
+    lockstep=False,
+    usage=False,
+    **pda_options,
+):
+    """
+    Simulate many input strings against the same machine.
+
+    The machine is loaded once, in the calling process (from the
+    compiled-machine cache when possible, see `cache.load_machine`), and
+    forked worker processes share it; the inputs are fanned out in chunks of
+    `chunksize`. Results are yielded in input order as
+    (final_state, stack, accepted) tuples, and at most a few chunks per worker
+    are in flight at once, so `inputs` can be an unbounded iterator.
+
+    Args:
+        machine_file (str): Path to the .pda file.
+        inputs (Iterable[str]): The input strings.
+        direction (str): 'f' or 'b'.
+        workers (int): Number of worker processes, defaults to the CPU count.
+            With 1 the inputs are simulated in the calling process.
+        chunksize (int): Number of inputs sent to a worker at a time.
+        use_cache (bool): Whether to use the compiled-machine cache.
+        cache_dir (str): Cache directory, see `cache.load_machine`.
+        minimize (bool): Remove the transitions that can never fire first, see `Machine.minimized`.
+        lockstep (bool): Simulate each chunk in lockstep with NumPy, see
+            `lockstep.simulate_lockstep`. Best with a large `chunksize`.
+        usage (bool): Add the input characters read and the steps taken to
+            each result, e.g. to measure what `reject_early` saves.
+        **pda_options: Passed on to `pda.Run`, e.g. max_steps, max_stack,
+            stack_backend or accept_early.
+
+    >>> import os
+    >>> machine = os.path.join(os.path.dirname(__file__), "examples", "counting.pda")
+    >>> for result in simulate_many(machine, ["(())", "(()"], "f", workers=1):
+    ...     print(result)
+    ('qacc', [], True)
+    ('q1', ['$', '('], False)
+    """
+    if direction not in ("f", "b"):
+        raise ValueError(f"Invalid direction: {direction}")
+    if workers is None:
+        workers = os.cpu_count() or 1
+    machine = Machine.from_file(machine_file, cache_dir=cache_dir, use_cache=use_cache)
+    if minimize:
+        machine = machine.minimized()[0]
+    if lockstep:
+        # Built before forking, so the workers share it too
+        machine.lockstep_table(direction)
+
+    if workers <= 1:
+        _init_worker(machine, pda_options)
+        for chunk in chunked(inputs, chunksize):
+            yield from _simulate_chunk(chunk, direction, lockstep, usage)
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(machine, pda_options),
+    ) as executor:
+        pending = deque()
+        for chunk in chunked(inputs, chunksize):
+            pending.append(
+                executor.submit(_simulate_chunk, chunk, direction, lockstep, usage)
+            )
+            # Bound the number of chunks in flight to keep memory flat
+            if len(pending) >= workers * 4:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def read_inputs(f):
+    """
+    Yield one input string per line of `f`, without the line terminator.
+    """
+    for line in f:
+        yield line.rstrip("\r\n")
@@ -0,0 +1,490 @@
+#! /usr/bin/env python3
+
+import argparse
+import gc
+import json
+import math
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, NamedTuple
+
+import utils
+from machine import Machine
+from pda import ENGINES
+from stacks import STACK_BACKENDS
+
+# Bracket pairs of the parentheses machines: the ASCII ones, then CJK
+# ideographs, which are single characters that need no quoting in a .pda file
+_BRACKETS = ["()", "[]", "{}", "<>"]
+
+
+def _bracket(kind):
+    if kind < len(_BRACKETS):
+        return _BRACKETS[kind]
+    code = 0x4E00 + 2 * (kind - len(_BRACKETS))
+    return chr(code) + chr(code + 1)
+
+
+class SyntheticMachine(NamedTuple):
+    """
+    A generated machine: its .pda source, and `make_input(length, accept, rng)`
+    returning an input of about `length` characters that the machine accepts
+    forward, or rejects near its end.
+    """
+
+    source: str
+    make_input: Callable[[int, bool, random.Random], str]
+
+
+def _source(forward):
+    """
+    Return the .pda source of a machine given by its forward rules, as
+    (fromState, inputChar, stackChar, toState, stackChange) in priority order,
+    adding the backward rule that undoes each one.
+
+    Backward rules are ordered consuming first, then popping first, which is
+    enough for the machines generated here to be deterministic backward too.
+    """
+    backward = {}
+    for from_state, input_char, stack_char, to_state, stack_change in forward:
+        backward.setdefault(to_state, []).append(
+            (to_state, input_char, stack_change, from_state, stack_char)
+        )
+    rows = [("f", *rule) for rule in forward]
+    for rules in backward.values():
+        rules.sort(key=lambda rule: (rule[1] == "", rule[2] == ""))
+        rows.extend(("b", *rule) for rule in rules)
+
+    lines = [",".join(utils.COLUMNS)]
+    for row in rows:
+        lines.append(",".join(field or "ep" for field in row))
+    return "\n".join(lines) + "\n"
+
+
+def parentheses(kinds=1) -> SyntheticMachine:
+    """
+    Balanced brackets of `kinds` kinds, like examples/counting.pda for one
+    kind. Many kinds make a wide input and stack alphabet.
+
+    >>> machine = parentheses(2)
+    >>> print(machine.source.splitlines()[2])
+    f,q1,(,ep,q1,(
+    >>> machine.make_input(8, True, random.Random(1))
+    '(())[][]'
+    """
+    pairs = [_bracket(kind) for kind in range(kinds)]
+    forward = [("q0", "", "", "q1", "$")]
+    forward += [("q1", opening, "", "q1", opening) for opening, _ in pairs]
+    forward += [("q1", closing, opening, "q1", "") for opening, closing in pairs]
+    forward.append(("q1", "", "$", "qacc", ""))
+
+    def make_input(length, accept, rng):
+        chars = []
+        stack = []
+        length -= length % 2
+        for position in range(length):
+            if stack and (len(stack) >= length - position or rng.random() < 0.5):
+                chars.append(stack.pop())
+            else:
+                opening, closing = rng.choice(pairs)
+                chars.append(opening)
+                stack.append(closing)
+        # One closing bracket too many
+        return "".join(chars) if accept else "".join(chars) + pairs[0][1]
+
+    return SyntheticMachine(_source(forward), make_input)
+
+
+def counting() -> SyntheticMachine:
+    """
+    0^n1^n for n >= 1, switching from counting up to counting down with an
+    epsilon move so the machine stays reversible.
+
+    >>> machine = counting()
+    >>> machine.make_input(6, True, random.Random()), machine.make_input(6, False, random.Random())
+    ('000111', '0001111')
+    """
+    forward = [
+        ("q0", "", "", "q1", "$"),
+        ("q1", "0", "", "q1", "0"),
+        ("q1", "", "0", "q2", "0"),
+        ("q2", "1", "0", "q2", ""),
+        ("q2", "", "$", "qacc", ""),
+    ]
+    return SyntheticMachine(_source(forward), _counting_input("0", "1"))
+
+
+def _counting_input(up, down):
+    def make_input(length, accept, rng):
+        n = max(length // 2, 1)
+        return up * n + down * (n if accept else n + 1)
+
+    return make_input
+
+
+def many_states(states=64) -> SyntheticMachine:
+    """
+    a^n b^n for n >= 1 on two rings of `states` states each: every a moves one
+    step around the first ring and every b one step back around the second.
+
+    >>> machine = many_states(3)
+    >>> len(machine.source.splitlines())
+    23
+    """
+    forward = [("q0", "", "", "s0", "$")]
+    for i in range(states):
+        forward.append((f"s{i}", "a", "", f"s{(i + 1) % states}", "A"))
+        forward.append((f"s{i}", "", "A", f"t{i}", "A"))
+    for i in range(states):
+        forward.append((f"t{i}", "b", "A", f"t{(i - 1) % states}", ""))
+    forward.append(("t0", "", "$", "qacc", ""))
+    return SyntheticMachine(_source(forward), _counting_input("a", "b"))
+
+
+def epsilon_heavy(chain=16) -> SyntheticMachine:
+    """
+    0^n1^n for n >= 1 where every character is preceded by a chain of `chain`
+    epsilon moves, so most steps consume no input.
+
+    >>> machine = epsilon_heavy(2)
+    >>> pda = Machine(utils.parse_transitions(machine.source)).run()
+    >>> pda.simulate("0011", "f"), pda.steps
+    (('qacc', [], True), 19)
+    """
+    forward = [("q0", "", "", "q1", "$"), ("q1", "", "", "e1", "")]
+    forward += [(f"e{i}", "", "", f"e{i + 1}", "") for i in range(1, chain)]
+    forward.append((f"e{chain}", "0", "", "q1", "0"))
+    forward.append((f"e{chain}", "", "0", "q2", "0"))
+    forward.append(("q2", "", "", "f1", ""))
+    forward += [(f"f{i}", "", "", f"f{i + 1}", "") for i in range(1, chain)]
+    forward.append((f"f{chain}", "1", "0", "q2", ""))
+    forward.append((f"f{chain}", "", "$", "qacc", ""))
+    return SyntheticMachine(_source(forward), _counting_input("0", "1"))
+
+
+def synthetic_machines(size=64):
+    """
+    Return the benchmark machines by name; `size` scales the number of
+    states, bracket kinds and epsilon moves per character.
+    """
+    return {
+        "parentheses": parentheses(),
+        "counting": counting(),
+        "many_states": many_states(size),
+        "wide_alphabet": parentheses(size),
+        "epsilon_heavy": epsilon_heavy(max(size // 4, 1)),
+    }
+
+
+def percentiles(samples):
+    """
+    Summarize latencies in nanoseconds, with nearest-rank percentiles.
+
+    >>> percentiles([4, 1, 3, 2])
+    {'min': 1, 'p50': 2, 'p90': 4, 'p99': 4, 'max': 4, 'mean': 2.5}
+    """
+    ordered = sorted(samples)
+
+    def rank(p):
+        return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+    return {
+        "min": ordered[0],
+        "p50": rank(50),
+        "p90": rank(90),
+        "p99": rank(99),
+        "max": ordered[-1],
+        "mean": sum(ordered) / len(ordered),
+    }
+
+
+def measure(function, repeat):
+    """
+    Call `function` `repeat` times and return its latencies and, from one
+    more call under tracemalloc, its peak memory in bytes. The garbage
+    collector is off while timing, so a collection does not land in one sample.
+    """
+    samples = []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = time.perf_counter_ns()
+            function()
+            samples.append(time.perf_counter_ns() - start)
+    finally:
+        gc.enable()
+
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return samples, peak
+
+
+def run_benchmarks(
+    machines,
+    length=10_000,
+    repeat=20,
+    seed=0,
+    engine="table",
+    stack_backend="list",
+):
+    """
+    Benchmark parsing, validating and simulating each machine in `machines`
+    (name -> SyntheticMachine), on an accepting and a rejecting input in both
+    directions. Backward runs read the forward input reversed, as `rePDAsim.py` does.
+    Returns one result dict per measurement.
+    """
+    rng = random.Random(seed)
+    results = []
+    for name, synthetic in machines.items():
+
+        def record(operation, function, **fields):
+            samples, peak = measure(function, repeat)
+            result = {
+                "machine": name,
+                "operation": operation,
+                **fields,
+                "latency_ns": percentiles(samples),
+                "peak_memory_bytes": peak,
+            }
+            results.append(result)
+            return result
+
+        transitions = utils.parse_transitions(synthetic.source)
+        rules = sum(
+            len(transitions_for_state)
+            for dir_transitions in transitions.values()
+            for transitions_for_state in dir_transitions.values()
+        )
+        record(
+            "parse_transitions",
+            lambda: utils.parse_transitions(synthetic.source),
+            rules=rules,
+        )
+        record(
+            "validate",
+            lambda: utils.validate(
+                transitions,
+                utils.INITIAL_STATE,
+                utils.FINAL_STATES,
+                utils.REJECT_STATES,
+            ),
+            rules=rules,
+        )
+
+        machine = Machine(transitions)
+        for accept in (True, False):
+            input_string = synthetic.make_input(length, accept, rng)
+            for direction in ("f", "b"):
+                run = machine.for_direction(direction).run(
+                    engine=engine, stack_backend=stack_backend
+                )
+                read = input_string[::-1] if direction == "b" else input_string
+
+                def simulate():
+                    run.reset()
+                    return run.simulate(read, direction)
+
+                accepted = simulate()[2]
+                result = record(
+                    "simulate",
+                    simulate,
+                    rules=rules,
+                    direction=direction,
+                    input="accepting" if accept else "rejecting",
+                    length=len(read),
+                    accepted=accepted,
+                    steps=run.steps,
+                )
+                result["steps_per_sec"] = run.steps * 1e9 / result["latency_ns"]["p50"]
+    return results
+
+
+def _key(result):
+    # Measurements only compare when their workloads are the same
+    return tuple(
+        result.get(field)
+        for field in ("machine", "operation", "rules", "direction", "input", "length")
+    )
+
+
+def compare(baseline, current, threshold=0.1):
+    """
+    Match the results of two benchmark runs and return (result, ratio) for
+    each measurement whose median latency grew by more than `threshold`.
+    Measurements of different machine sizes or input lengths are not matched.
+
+    >>> old = [{"machine": "m", "operation": "validate", "latency_ns": {"p50": 100}}]
+    >>> new = [{"machine": "m", "operation": "validate", "latency_ns": {"p50": 150}}]
+    >>> [(result["operation"], ratio) for result, ratio in compare(old, new)]
+    [('validate', 1.5)]
+    """
+    previous = {_key(result): result for result in baseline}
+    regressions = []
+    for result in current:
+        old = previous.get(_key(result))
+        if old is None:
+            continue
+        ratio = result["latency_ns"]["p50"] / max(old["latency_ns"]["p50"], 1)
+        if ratio > 1 + threshold:
+            regressions.append((result, ratio))
+    return regressions
+
+
+def format_results(results):
+    """
+    Return the results as a human-readable table.
+    """
+    lines = [
+        f"{'Machine':<16}{'Operation':<20}{'Run':<14}{'p50 (ms)':>10}"
+        f"{'p99 (ms)':>10}{'Peak (KiB)':>12}{'Steps/s':>14}"
+    ]
+    for result in results:
+        run = ""
+        if "direction" in result:
+            run = f"{result['direction']} {result['input']}"
+        steps = result.get("steps_per_sec")
+        lines.append(
+            f"{result['machine']:<16}{result['operation']:<20}{run:<14}"
+            f"{result['latency_ns']['p50'] / 1e6:>10.3f}"
+            f"{result['latency_ns']['p99'] / 1e6:>10.3f}"
+            f"{result['peak_memory_bytes'] / 1024:>12.1f}"
+            f"{'' if steps is None else f'{steps:,.0f}':>14}"
+        )
+    return "\n".join(lines)
+
+
+def parse_args(argv=None):
+    names = list(synthetic_machines(1))
+    parser = argparse.ArgumentParser(
+        description="Benchmark parsing, validation and simulation on generated machines."
+    )
+    parser.add_argument(
+        "--machines",
+        nargs="+",
+        choices=names,
+        default=names,
+        metavar="NAME",
+        help=f"machines to benchmark (default: all of {', '.join(names)})",
+    )
+    parser.add_argument(
+        "--size",
+        type=int,
+        default=64,
+        help="states, bracket kinds or epsilon moves per character of the "
+        "scalable machines (default: 64)",
+    )
+    parser.add_argument(
+        "--length",
+        type=int,
+        default=10_000,
+        help="input length (default: 10000)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=20,
+        help="timed calls per measurement (default: 20)",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="seed of the input generators"
+    )
+    parser.add_argument("--engine", choices=ENGINES, default="table")
+    parser.add_argument("--stack", choices=STACK_BACKENDS, default="list")
+    parser.add_argument(
+        "-o", "--output", metavar="FILE", help="save the results as JSON to FILE"
+    )
+    parser.add_argument(
+        "--compare",
+        metavar="FILE",
+        help="compare with the JSON results in FILE and exit with status 1 on a regression",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="median latency increase counted as a regression by --compare "
+        "(default: 0.1, i.e. 10%%)",
+    )
+    args = parser.parse_args(argv)
+
+    if args.size < 1 or args.length < 1 or args.repeat < 1:
+        parser.error("--size, --length and --repeat must be positive.")
+    if args.engine == "codegen" and args.stack != "list":
+        parser.error("--engine codegen does not support --stack.")
+    return args
+
+
+def main():
+    args = parse_args()
+    machines = synthetic_machines(args.size)
+    results = run_benchmarks(
+        {name: machines[name] for name in args.machines},
+        length=args.length,
+        repeat=args.repeat,
+        seed=args.seed,
+        engine=args.engine,
+        stack_backend=args.stack,
+    )
+    print(format_results(results))
+
+    if args.output is not None:
+        report = {
+            "date": datetime.now(timezone.utc).isoformat(),
+            "python": sys.version,
+            "platform": platform.platform(),
+            "options": {
+                name: getattr(args, name)
+                for name in (
+                    "machines",
+                    "size",
+                    "length",
+                    "repeat",
+                    "seed",
+                    "engine",
+                    "stack",
+                )
+            },
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        # Timings of different engines or stacks are not comparable
+        options = baseline.get("options", {})
+        for name, default in (("engine", "table"), ("stack", "list")):
+            if options.get(name, default) != getattr(args, name):
+                print(
+                    f"Cannot compare with {args.compare}: it was run with "
+                    f"--{name} {options.get(name, default)}, not {getattr(args, name)}.",
+                    file=sys.stderr,
+                )
+                sys.exit(2)
+        regressions = compare(baseline["results"], results, args.threshold)
+        for result, ratio in regressions:
+            run = (
+                f" {result['direction']} {result['input']}"
+                if "direction" in result
+                else ""
+            )
+            print(
+                f"Regression: {result['machine']} {result['operation']}{run} "
+                f"is {ratio:.2f}x slower"
+            )
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
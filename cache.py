@@ -0,0 +1,126 @@
+import hashlib
+import os
+import pickle
+import tempfile
+from typing import NamedTuple
+
+import utils
+from table import TransitionTable, compile_transitions
+
+# Bump whenever the layout of a cached machine changes, so old blobs are ignored
+CACHE_VERSION = 3
+
+CACHE_SUFFIX = ".pdac"
+
+
+class CompiledMachine(NamedTuple):
+    """
+    A parsed, validated and compiled .pda file.
+    The report is computed for the conventional states in `utils`.
+    """
+
+    transitions: dict
+    table: TransitionTable
+    report: utils.ValidationReport
+
+
+def default_cache_dir():
+    """
+    Return $REPDASIM_CACHE_DIR, or rePDAsim under the user's cache directory.
+    """
+    if "REPDASIM_CACHE_DIR" in os.environ:
+        return os.environ["REPDASIM_CACHE_DIR"]
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "rePDAsim")
+
+
+def cache_key(machine_file) -> str:
+    """
+    Hash the file contents together with everything else the cached blob depends on,
+    so any change to the machine or to the cache layout selects a new entry.
+    The file is hashed in chunks, so memory use does not depend on its size.
+    """
+    digest = hashlib.sha256()
+    with open(machine_file, "rb") as f:
+        for block in iter(lambda: f.read(utils.CHUNK_SIZE), b""):
+            digest.update(block)
+    digest.update(
+        repr(
+            (
+                CACHE_VERSION,
+                utils.INITIAL_STATE,
+                utils.FINAL_STATES,
+                utils.REJECT_STATES,
+            )
+        ).encode()
+    )
+    return digest.hexdigest()
+
+
+def compile_machine(machine_file) -> CompiledMachine:
+    """
+    Parse, validate and compile a .pda file, without any caching.
+    """
+    transitions = utils.parse_transitions_file(machine_file)
+    table = compile_transitions(transitions)
+    report = utils.validation_report(
+        transitions, utils.INITIAL_STATE, utils.FINAL_STATES, utils.REJECT_STATES
+    )
+    return CompiledMachine(transitions, table, report)
+
+
+def load_machine(machine_file, cache_dir=None, use_cache=True) -> CompiledMachine:
+    """
+    Load a .pda file, reusing the compiled machine cached for its contents if there is one.
+
+    The cache entry is a pickle named after `cache_key` of the file contents in
+    `cache_dir` (by default `default_cache_dir()`), so editing the file
+    invalidates it automatically. Unreadable or stale entries are rebuilt and a
+    cache directory that cannot be written to is ignored.
+
+    >>> import os, tempfile
+    >>> machine = os.path.join(os.path.dirname(__file__), "examples", "counting.pda")
+    >>> with tempfile.TemporaryDirectory() as cache_dir:
+    ...     first = load_machine(machine, cache_dir=cache_dir)
+    ...     second = load_machine(machine, cache_dir=cache_dir)
+    ...     len(os.listdir(cache_dir))
+    1
+    >>> second.transitions == first.transitions, bool(second.report)
+    (True, True)
+    >>> second.table.states
+    ['q0', 'q1', 'qacc']
+    """
+    if not use_cache:
+        return compile_machine(machine_file)
+
+    if cache_dir is None:
+        cache_dir = default_cache_dir()
+    path = os.path.join(cache_dir, cache_key(machine_file) + CACHE_SUFFIX)
+
+    try:
+        with open(path, "rb") as f:
+            machine = pickle.load(f)
+        if isinstance(machine, CompiledMachine):
+            return machine
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        pass
+
+    machine = compile_machine(machine_file)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write to a temporary file first so concurrent runs never read a partial blob
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    except OSError:
+        return machine
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(machine, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+    return machine
@@ -0,0 +1,261 @@
+from table import TransitionTable
+
+
+def _rule_condition(input_char, stack_char):
+    """
+    Return the Python condition under which a rule applies.
+    """
+    conditions = []
+    if input_char:
+        conditions.append(f"c == {input_char!r}")
+    if stack_char:
+        conditions.append(f"top == {stack_char!r}")
+    return " and ".join(conditions) or "True"
+
+
+def _rule_effects(rule, state_ids, direction, consume):
+    """
+    Return the lines that apply a rule: stack update, state change, input advance and budgets.
+    """
+    (input_char, stack_char), (to_state, stack_change) = rule
+    lines = []
+    if stack_char:
+        lines.append("pop()")
+    for symbol in reversed(stack_change):
+        lines.append(f"push({symbol!r})")
+    lines.append(f"state = {state_ids[to_state]}")
+    if input_char and consume:
+        lines.append("i += 1")
+    lines.append("steps += 1")
+    lines.append("if max_steps is not None and steps > max_steps:")
+    lines.append(
+        f"    _limit('step budget of ' + str(max_steps), state, {direction!r}, steps, stack)"
+    )
+    if stack_change:
+        lines.append("if max_stack is not None and len(stack) > max_stack:")
+        lines.append(
+            f"    _limit('stack budget of ' + str(max_stack), state, {direction!r}, steps, stack)"
+        )
+    return lines
+
+
+def _unconditional(transitions_for_state):
+    """
+    Return the first rule of a state if it applies to every input and stack top, else None.
+    """
+    for rule in transitions_for_state.items():
+        (input_char, stack_char), _ = rule
+        if not input_char and not stack_char:
+            return rule
+        return None
+    return None
+
+
+def generate_source(transitions, direction, stop_states=frozenset(), table=None):
+    """
+    Generate the source of a simulator specialized to one direction of a machine.
+
+    The generated `run(s, state, stack, max_steps, max_stack)` dispatches on the
+    state id and tests each rule of the state inline, in dict order, so it
+    picks the same transition as `PDA.step`. A rule that applies to every
+    input and stack top (an unconditional epsilon move) is followed straight
+    into the next state's unconditional rule, so chains of them run without
+    going back through the dispatch. It returns (state id, input position,
+    steps, halted), where halted means the run stopped on a character with no
+    valid transition or in one of `stop_states` (see `Machine.stop_states`).
+    `table` is the compiled form of `transitions`, compiled here when not
+    given; only its state ids are used.
+
+    >>> source = generate_source({"f": {"q0": {("0", ""): ("q1", "1")}}, "b": {}}, "f")
+    >>> print(source.split("while True:")[1].split("else:")[0].rstrip())
+    <BLANKLINE>
+            if state == 0:
+                # 'q0'
+                if i < n:
+                    c = s[i]
+                    if c == '0':
+                        push('1')
+                        state = 1
+                        i += 1
+                        steps += 1
+                        if max_steps is not None and steps > max_steps:
+                            _limit('step budget of ' + str(max_steps), state, 'f', steps, stack)
+                        if max_stack is not None and len(stack) > max_stack:
+                            _limit('stack budget of ' + str(max_stack), state, 'f', steps, stack)
+                        continue
+                    return state, i, steps, True
+                return state, i, steps, False
+    """
+    if table is None:
+        table = TransitionTable(transitions)
+    state_ids = table.state_ids
+    dir_transitions = transitions.get(direction, {})
+    stop_states = frozenset(stop_states).intersection(state_ids)
+
+    lines = [
+        "def run(s, state, stack, max_steps, max_stack):",
+        "    n = len(s)",
+        "    i = 0",
+        "    steps = 0",
+        "    push = stack.append",
+        "    pop = stack.pop",
+        "    while True:",
+    ]
+    keyword = "if"
+    for from_state in sorted(stop_states, key=state_ids.get):
+        lines.append(f"        {keyword} state == {state_ids[from_state]}:")
+        lines.append(f"            # {from_state!r}")
+        lines.append("            return state, i, steps, True")
+        keyword = "elif"
+    for from_state, transitions_for_state in dir_transitions.items():
+        if not transitions_for_state or from_state in stop_states:
+            continue
+        lines.append(f"        {keyword} state == {state_ids[from_state]}:")
+        lines.append(f"            # {from_state!r}")
+        keyword = "elif"
+        body = []
+
+        rule = _unconditional(transitions_for_state)
+        if rule is not None:
+            # Follow the chain of unconditional epsilon moves as straight-line code
+            seen = {from_state}
+            while rule is not None:
+                body.extend(_rule_effects(rule, state_ids, direction, consume=False))
+                to_state = rule[1][0]
+                if to_state in seen or to_state in stop_states:
+                    break
+                seen.add(to_state)
+                rule = _unconditional(dir_transitions.get(to_state, {}))
+            body.append("continue")
+        else:
+            needs_top = any(stack_char for _, stack_char in transitions_for_state)
+            has_epsilon = any(not input_char for input_char, _ in transitions_for_state)
+
+            # Reading a character: every rule may apply
+            body.append("if i < n:")
+            body.append("    c = s[i]")
+            if needs_top:
+                body.append("    top = stack[-1] if stack else None")
+            for rule in transitions_for_state.items():
+                condition = _rule_condition(*rule[0])
+                body.append(f"    if {condition}:")
+                body.extend(
+                    "        " + line
+                    for line in _rule_effects(rule, state_ids, direction, consume=True)
+                )
+                body.append("        continue")
+            body.append("    return state, i, steps, True")
+
+            # End of input: only epsilon rules apply, and none means the run is over
+            if has_epsilon:
+                if needs_top:
+                    body.append("top = stack[-1] if stack else None")
+                for rule in transitions_for_state.items():
+                    input_char, stack_char = rule[0]
+                    if input_char:
+                        continue
+                    condition = _rule_condition(input_char, stack_char)
+                    body.append(f"if {condition}:")
+                    body.extend(
+                        "    " + line
+                        for line in _rule_effects(
+                            rule, state_ids, direction, consume=False
+                        )
+                    )
+                    body.append("    continue")
+                body.append("return state, i, steps, True")
+            else:
+                body.append("return state, i, steps, False")
+
+        lines.extend("            " + line for line in body)
+
+    # States without rules in this direction
+    indent = "        "
+    if keyword == "elif":
+        lines.append("        else:")
+        indent = "            "
+    lines.append(f"{indent}return state, i, steps, i < n")
+    return "\n".join(lines) + "\n"
+
+
+def _limit(budget, state_id, direction, steps, stack, states):
+    from pda import SimulationLimitError
+
+    raise SimulationLimitError(
+        f"Exceeded the {budget} in state '{states[state_id]}' "
+        f"(direction '{direction}', {steps} steps, stack depth {len(stack)})."
+    )
+
+
+class CompiledSimulator:
+    """
+    A generated simulator for one direction of a machine, see `generate_source`.
+    """
+
+    def __init__(self, transitions, direction, stop_states=frozenset(), table=None):
+        if table is None:
+            table = TransitionTable(transitions)
+        self.direction = direction
+        self.source = generate_source(transitions, direction, stop_states, table)
+        self.states = table.states
+        self.state_ids = table.state_ids
+
+        states = self.states
+        namespace = {
+            "_limit": lambda budget, state_id, direction, steps, stack: _limit(
+                budget, state_id, direction, steps, stack, states
+            )
+        }
+        exec(compile(self.source, f"<pda simulator '{direction}'>", "exec"), namespace)
+        self._run = namespace["run"]
+
+    def run(
+        self, input_string, initial_state, stack=None, max_steps=None, max_stack=None
+    ):
+        """
+        Run the generated simulator. Returns (final state, stack, input position, steps, halted).
+        """
+        if stack is None:
+            stack = []
+        state_id = self.state_ids.get(initial_state)
+        if state_id is None:
+            # A state the machine never mentions has no transitions at all
+            return initial_state, stack, 0, 0, bool(input_string)
+        state_id, position, steps, halted = self._run(
+            input_string, state_id, stack, max_steps, max_stack
+        )
+        return self.states[state_id], stack, position, steps, halted
+
+
+def compile_simulator(
+    transitions, direction, stop_states=frozenset(), table=None
+) -> CompiledSimulator:
+    """
+    Generate and compile the simulator for one direction of a machine,
+    reusing its compiled `table` if given.
+    `machine.Machine.simulator` keeps the ones a machine has used.
+    """
+    return CompiledSimulator(transitions, direction, stop_states, table)
+
+
+def simulate(transitions, input_string, direction, initial_state, final_states):
+    """
+    Simulate a machine with its generated simulator.
+    Returns the same (final state, stack, accepted) tuple as `PDA.simulate`.
+
+    >>> transitions = {
+    ...     "f": {
+    ...         "q0": {("", ""): ("q1", "1")},
+    ...         "q1": {("1", "1"): ("q2", "")},
+    ...     },
+    ...     "b": {}
+    ... }
+    >>> simulate(transitions, "1", "f", "q0", ["q2"])
+    ('q2', [], True)
+    >>> simulate(transitions, "11", "f", "q0", ["q2"])
+    ('q2', [], False)
+    """
+    state, stack, _, _, halted = compile_simulator(transitions, direction).run(
+        input_string, initial_state
+    )
+    return state, stack, not halted and state in set(final_states)
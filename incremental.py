@@ -0,0 +1,133 @@
+from collections import OrderedDict
+
+# Characters between checkpoints, and checkpoints kept per direction
+CHECKPOINT_INTERVAL = 4096
+MAX_CHECKPOINTS = 256
+
+
+def common_prefix_length(a, b):
+    """
+    Return the length of the longest common prefix of two strings, comparing
+    slices so the work is done in C.
+
+    >>> common_prefix_length("(()())", "(()(("), common_prefix_length("", "(")
+    (4, 0)
+    """
+    low, high = 0, min(len(a), len(b))
+    while low < high:
+        middle = (low + high + 1) // 2
+        if a[low:middle] == b[low:middle]:
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+class PrefixCache:
+    """
+    Re-simulates edited versions of an input on a `pda.Run`, resuming from
+    the last checkpoint before the first changed character instead of
+    starting over, so the work done tracks the size of the edit rather than
+    the size of the input.
+
+    Checkpoints (see `Run.checkpoint`) are taken every `interval` characters
+    and at the end of each input, before the final epsilon moves. Only the
+    `max_checkpoints` most recently taken or used ones are kept per
+    direction; checkpoints past an edit are dropped. Results are exactly
+    those of `Run.simulate` on a freshly reset run, including the step count
+    and budgets, but a tracer only sees the steps actually taken.
+
+    Most stack backends copy the stack into each checkpoint; the "linked"
+    backend shares it, which suits inputs that build deep stacks.
+    One cache holds the checkpoints of one input being edited, so keep one
+    per document; runs of the same machine are cheap.
+
+    >>> from pda import PDA
+    >>> transitions = {
+    ...     "f": {
+    ...         "q0": {("", ""): ("q1", "$")},
+    ...         "q1": {("(", ""): ("q1", "("), (")", "("): ("q1", ""), ("", "$"): ("qacc", "")},
+    ...     },
+    ...     "b": {},
+    ... }
+    >>> cache = PrefixCache(PDA(transitions, "q0", ["qacc"], []), interval=2)
+    >>> cache.simulate("(()(", "f")
+    ('q1', ['$', '(', '('], False)
+    >>> cache.simulate("(()())", "f"), cache.resumed_from
+    (('qacc', [], True), 4)
+    >>> cache.simulate("(())", "f"), cache.resumed_from
+    (('qacc', [], True), 2)
+    """
+
+    def __init__(
+        self, run, interval=CHECKPOINT_INTERVAL, max_checkpoints=MAX_CHECKPOINTS
+    ):
+        if interval < 1 or max_checkpoints < 1:
+            raise ValueError("interval and max_checkpoints must be positive.")
+        self.run = run
+        self.interval = interval
+        self.max_checkpoints = max_checkpoints
+        # direction -> last input simulated, and direction -> {position: Checkpoint}
+        # with the least recently used checkpoint first
+        self.inputs = {}
+        self.checkpoints = {}
+        # Position the last simulation resumed from
+        self.resumed_from = 0
+
+    def clear(self):
+        """
+        Drop every checkpoint, e.g. after changing the run's budgets.
+        """
+        self.inputs.clear()
+        self.checkpoints.clear()
+
+    def _resume(self, input_string, direction):
+        """
+        Restore the run to the last valid checkpoint for `input_string` and return its position.
+        """
+        checkpoints = self.checkpoints.setdefault(direction, OrderedDict())
+        previous = self.inputs.get(direction)
+        self.inputs[direction] = input_string
+        unchanged = (
+            0 if previous is None else common_prefix_length(previous, input_string)
+        )
+
+        start = 0
+        for position in list(checkpoints):
+            if position > unchanged:
+                del checkpoints[position]
+            elif position > start:
+                start = position
+        if start:
+            checkpoints.move_to_end(start)
+            self.run.restore(checkpoints[start])
+        else:
+            self.run.reset()
+        return start
+
+    def _save(self, direction):
+        checkpoints = self.checkpoints[direction]
+        checkpoints[self.run.position] = self.run.checkpoint()
+        checkpoints.move_to_end(self.run.position)
+        if len(checkpoints) > self.max_checkpoints:
+            checkpoints.popitem(last=False)
+
+    def simulate(self, input_string, direction):
+        """
+        Simulate `input_string` as `Run.simulate` does, reusing the checkpoints of earlier inputs.
+        """
+        run = self.run
+        start = self.resumed_from = self._resume(input_string, direction)
+        run.input = input_string
+        run.direction = direction
+
+        # Checkpoints go on multiples of the interval, plus one at the end
+        interval = self.interval
+        position = start
+        while position < len(input_string):
+            end = min(position - position % interval + interval, len(input_string))
+            if not run.feed(input_string[position:end], direction):
+                break
+            position = end
+            self._save(direction)
+        return run.finish(direction)
@@ -0,0 +1,252 @@
+from pda import SimulationLimitError
+
+# NumPy, imported by _require_numpy on first use so that importing this
+# module stays cheap; it is only needed for lockstep simulation
+np = None
+
+
+def _require_numpy():
+    global np
+    if np is None:
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError(
+                "Lockstep simulation requires NumPy (pip install numpy)."
+            ) from None
+        np = numpy
+
+
+def _limit(budget, state, direction, steps, depth, row):
+    raise SimulationLimitError(
+        f"Exceeded the {budget} in state '{state}' "
+        f"(direction '{direction}', {steps} steps, stack depth {depth}) on input {row}."
+    )
+
+
+def _encode_inputs(table, input_strings, lengths, width):
+    """
+    Return the inputs as one array of input symbol ids, a row per input padded with 0.
+    Characters the machine never mentions can only match epsilon rules, like id 0.
+    """
+    count = len(input_strings)
+    inputs = np.zeros((count, width), dtype=np.int64)
+    total = int(lengths.sum())
+    if not total:
+        return inputs
+    codes = np.frombuffer("".join(input_strings).encode("utf-32-le"), dtype=np.uint32)
+
+    # Map code points to symbol ids through the sorted code points of the alphabet
+    alphabet = sorted(
+        (ord(symbol), symbol_id)
+        for symbol, symbol_id in table.input_ids.items()
+        if len(symbol) == 1
+    )
+    keys = np.array([code for code, _ in alphabet] or [0], dtype=np.uint32)
+    ids = np.array([symbol_id for _, symbol_id in alphabet] or [0], dtype=np.int64)
+    index = np.minimum(np.searchsorted(keys, codes), len(keys) - 1)
+    symbol_ids = np.where(keys[index] == codes, ids[index], 0)
+
+    rows = np.repeat(np.arange(count), lengths)
+    starts = np.cumsum(lengths) - lengths
+    columns = np.arange(total) - np.repeat(starts, lengths)
+    inputs[rows, columns] = symbol_ids
+    return inputs
+
+
+class LockstepTable:
+    """
+    One direction of a `table.TransitionTable` as NumPy arrays, indexed by the
+    same flat (state, input, stack-top) cell index. Missing transitions have
+    next_state -1, and push holds the pushed ids left-aligned, padded with 0.
+    """
+
+    __slots__ = ("next_state", "pop", "push", "push_len", "consumes", "epsilon")
+
+    def __init__(self, table, direction):
+        _require_numpy()
+        cells = table.cells.get(direction, [])
+        width = max((len(cell[2]) for cell in cells if cell is not None), default=0)
+        self.next_state = np.full(len(cells), -1, dtype=np.int64)
+        self.pop = np.zeros(len(cells), dtype=np.int64)
+        self.push = np.zeros((len(cells), max(width, 1)), dtype=np.int64)
+        self.push_len = np.zeros(len(cells), dtype=np.int64)
+        self.consumes = np.zeros(len(cells), dtype=np.int64)
+        for index, cell in enumerate(cells):
+            if cell is None:
+                continue
+            to_state, pop, push, consumes = cell
+            self.next_state[index] = to_state
+            self.pop[index] = pop != 0
+            self.push[index, : len(push)] = push
+            self.push_len[index] = len(push)
+            self.consumes[index] = consumes
+        self.epsilon = np.array(
+            table.epsilon.get(direction, [False] * len(table.states)), dtype=bool
+        )
+
+
+def simulate_lockstep(
+    table,
+    input_strings,
+    direction,
+    initial_state,
+    final_states,
+    max_steps=None,
+    max_stack=None,
+    stop_states=(),
+    accept_early=False,
+    usage=False,
+    lockstep_table=None,
+):
+    """
+    Simulate many input strings at once, advancing all of their configurations in lockstep.
+
+    State ids, input positions and stack pointers are NumPy arrays with one
+    entry per input, and the stacks are rows of a 2D array that is widened as
+    needed. Each iteration does one gather from the compiled transition table
+    for every run that is still going; runs that halt or finish are masked out.
+    Returns the same (final state, stack, accepted) tuples as `PDA.simulate`,
+    in input order, followed by the input characters read and the steps
+    taken with `usage`. This pays off for many short strings; long runs are better
+    served by the other engines.
+
+    Args:
+        table (TransitionTable): The compiled machine.
+        input_strings (list[str]): The inputs, already reversed for backward runs.
+        direction (str): 'f' or 'b'.
+        initial_state (str): The state every run starts from.
+        final_states (Iterable[str]): The accepting states.
+        max_steps (int): Step budget of each run, None for unbounded.
+        max_stack (int): Stack depth budget of each run, None for unbounded.
+        stop_states (Iterable[str]): States in which a run halts, see `Machine.stop_states`.
+        accept_early (bool): Whether a run that halts in a final state accepts.
+        usage (bool): Whether to add the characters read and steps taken to each result.
+        lockstep_table (LockstepTable): `table` as NumPy arrays for `direction`,
+            built here when not given; see `Machine.lockstep_table`.
+
+    >>> from table import compile_transitions
+    >>> table = compile_transitions({
+    ...     "f": {
+    ...         "q0": {("", ""): ("q1", "$")},
+    ...         "q1": {("(", ""): ("q1", "("), (")", "("): ("q1", ""), ("", "$"): ("qacc", "")},
+    ...     },
+    ...     "b": {},
+    ... })
+    >>> for result in simulate_lockstep(table, ["(())", "(()", "())", ""], "f", "q0", ["qacc"]):
+    ...     print(result)
+    ('qacc', [], True)
+    ('q1', ['$', '('], False)
+    ('qacc', [], False)
+    ('qacc', [], True)
+    >>> simulate_lockstep(table, ["())"], "f", "q0", ["qacc"], stop_states=["qacc"], accept_early=True, usage=True)
+    [('qacc', [], True, 2, 4)]
+    """
+    _require_numpy()
+    count = len(input_strings)
+    states = table.states
+    initial_id = table.state_ids.get(initial_state)
+    if initial_id is None or direction not in table.cells:
+        # Without transitions only an empty input can be accepted, in place
+        accepted = initial_state in final_states
+        results = [(initial_state, [], accepted and not s) for s in input_strings]
+        return [result + (0, 0) for result in results] if usage else results
+
+    lockstep = lockstep_table
+    if lockstep is None:
+        lockstep = LockstepTable(table, direction)
+    n_inputs = len(table.input_symbols)
+    n_stack = len(table.stack_symbols)
+    final_mask = np.array([state in final_states for state in states], dtype=bool)
+    stop_mask = np.array([state in stop_states for state in states], dtype=bool)
+
+    lengths = np.fromiter(map(len, input_strings), dtype=np.int64, count=count)
+    width = max(int(lengths.max(initial=0)), 1)
+    inputs = _encode_inputs(table, input_strings, lengths, width)
+
+    state = np.full(count, initial_id, dtype=np.int64)
+    position = np.zeros(count, dtype=np.int64)
+    depth = np.zeros(count, dtype=np.int64)
+    stacks = np.zeros((count, 16), dtype=np.int64)
+    halted = np.zeros(count, dtype=bool)
+    row_steps = np.zeros(count, dtype=np.int64)
+    active = np.arange(count)
+    steps = 0
+
+    while active.size:
+        current = state[active]
+        sp = depth[active]
+        pos = position[active]
+        at_end = pos >= lengths[active]
+        char = np.where(at_end, 0, inputs[active, np.minimum(pos, width - 1)])
+        top = np.where(sp > 0, stacks[active, np.maximum(sp - 1, 0)], 0)
+        cell = (current * n_inputs + char) * n_stack + top
+        next_state = lockstep.next_state[cell]
+
+        # At the end of the input a state without epsilon rules ends the run;
+        # anywhere else a missing transition halts it, as does a stop state
+        stopped = stop_mask[current]
+        finished = ~stopped & at_end & ~lockstep.epsilon[current]
+        failed = stopped | (~finished & (next_state < 0))
+        halted[active[failed]] = True
+        moving = ~(finished | failed)
+        active = active[moving]
+        if not active.size:
+            break
+        cell = cell[moving]
+        sp = sp[moving] - lockstep.pop[cell]
+        push_len = lockstep.push_len[cell]
+        new_depth = sp + push_len
+
+        needed = int(new_depth.max())
+        if needed > stacks.shape[1]:
+            grown = np.zeros((count, max(needed, 2 * stacks.shape[1])), dtype=np.int64)
+            grown[:, : stacks.shape[1]] = stacks
+            stacks = grown
+        for k in range(int(push_len.max())):
+            pushing = push_len > k
+            stacks[active[pushing], sp[pushing] + k] = lockstep.push[cell[pushing], k]
+
+        depth[active] = new_depth
+        state[active] = next_state[moving]
+        position[active] += lockstep.consumes[cell]
+        row_steps[active] += 1
+        steps += 1
+
+        if max_steps is not None and steps > max_steps:
+            row = active[0]
+            _limit(
+                f"step budget of {max_steps}",
+                states[state[row]],
+                direction,
+                steps,
+                depth[row],
+                row,
+            )
+        if max_stack is not None and needed > max_stack:
+            row = active[np.argmax(new_depth)]
+            _limit(
+                f"stack budget of {max_stack}",
+                states[state[row]],
+                direction,
+                steps,
+                depth[row],
+                row,
+            )
+
+    symbols = table.stack_symbols
+    accepted = (final_mask[state] & (~halted | accept_early)).tolist()
+    results = [
+        (states[state_id], [symbols[symbol_id] for symbol_id in row[:size]], accept)
+        for state_id, row, size, accept in zip(
+            state.tolist(), stacks.tolist(), depth.tolist(), accepted
+        )
+    ]
+    if usage:
+        results = [
+            result + (used, taken)
+            for result, used, taken in zip(
+                results, position.tolist(), row_steps.tolist()
+            )
+        ]
+    return results
@@ -0,0 +1,355 @@
+from types import MappingProxyType
+
+import utils
+from analysis import Analysis, analyze, doomed_states, minimize, shadowed_rules
+from cache import load_machine
+from codegen import compile_simulator
+from table import compile_transitions
+
+# Backward runs start from this state and accept on returning to the initial state
+BACKWARD_INITIAL_STATE = "qacc"
+
+
+def _freeze(transitions):
+    """
+    Return a read-only copy of a transitions dict, see `utils.parse_transitions`.
+    """
+    return MappingProxyType(
+        {
+            direction: MappingProxyType(
+                {
+                    from_state: MappingProxyType(dict(transitions_for_state))
+                    for from_state, transitions_for_state in dir_transitions.items()
+                }
+            )
+            for direction, dir_transitions in transitions.items()
+        }
+    )
+
+
+def _thaw(transitions):
+    """
+    Return a plain, mutable copy of transitions frozen by `_freeze`.
+    """
+    return {
+        direction: {
+            from_state: dict(transitions_for_state)
+            for from_state, transitions_for_state in dir_transitions.items()
+        }
+        for direction, dir_transitions in transitions.items()
+    }
+
+
+def _rules_key(transitions):
+    return tuple(
+        (
+            direction,
+            tuple(
+                (from_state, tuple(transitions_for_state.items()))
+                for from_state, transitions_for_state in dir_transitions.items()
+            ),
+        )
+        for direction, dir_transitions in transitions.items()
+    )
+
+
+class Machine:
+    """
+    An immutable PDA definition: transitions, their compiled table and the
+    initial, final and reject states.
+
+    A machine holds no run state, so any number of `pda.Run` objects, in any
+    number of threads, can run it at once; each run keeps only its own state
+    and stack and shares the table. Machines compare and hash by their rules
+    and states, and the transitions are read-only views. Worker processes
+    forked after a machine is built share its memory without copying it.
+
+    >>> transitions = {
+    ...     "f": {
+    ...         "q0": {("", ""): ("q1", "$")},
+    ...         "q1": {("(", ""): ("q1", "("), (")", "("): ("q1", ""), ("", "$"): ("qacc", "")},
+    ...     },
+    ...     "b": {},
+    ... }
+    >>> machine = Machine(transitions, "q0", ["qacc"], [])
+    >>> first, second = machine.run(), machine.run()
+    >>> first.feed("((", "f"), second.feed("()", "f")
+    (True, True)
+    >>> first.stack, second.stack, first.table is second.table
+    (['$', '(', '('], ['$'], True)
+    >>> machine == Machine(transitions, "q0", ["qacc"], [])
+    True
+    >>> machine.final_states = {"q0"}
+    Traceback (most recent call last):
+        ...
+    AttributeError: Machine is immutable.
+    >>> backward = machine.for_direction("b")
+    >>> backward.initial_state, backward.final_states, backward.table is machine.table
+    ('qacc', frozenset({'q0'}), True)
+    """
+
+    __slots__ = (
+        "transitions",
+        "table",
+        "initial_state",
+        "final_states",
+        "reject_states",
+        "_rules",
+        "_hash",
+        "_simulators",
+        "_lockstep",
+        "_doomed",
+        "_stops",
+    )
+
+    def __init__(
+        self,
+        transitions,
+        initial_state=utils.INITIAL_STATE,
+        final_states=utils.FINAL_STATES,
+        reject_states=utils.REJECT_STATES,
+        table=None,
+    ):
+        """
+        `table` is the compiled form of `transitions`; it is compiled here when
+        not given (see `cache.load_machine` for loading a precompiled one).
+        """
+        if table is None:
+            table = compile_transitions(transitions)
+        self._set(
+            transitions=_freeze(transitions),
+            table=table,
+            initial_state=initial_state,
+            final_states=frozenset(final_states),
+            reject_states=frozenset(reject_states),
+            _rules=_rules_key(transitions),
+            # Generated simulators by direction, see `simulator`
+            _simulators={},
+            # NumPy tables by direction, see `lockstep_table`
+            _lockstep={},
+            # Doomed states by direction, see `doomed_states`
+            _doomed={},
+            # Stop states by direction and options, see `stop_states`
+            _stops={},
+        )
+        self._set(_hash=hash(self._key()))
+
+    def _set(self, **fields):
+        for name, value in fields.items():
+            object.__setattr__(self, name, value)
+
+    @classmethod
+    def from_file(cls, machine_file, cache_dir=None, use_cache=True):
+        """
+        Load a .pda file, from the compiled-machine cache when possible (see
+        `cache.load_machine`), with the conventional states in `utils`.
+        """
+        compiled = load_machine(machine_file, cache_dir=cache_dir, use_cache=use_cache)
+        return cls(compiled.transitions, table=compiled.table)
+
+    def with_states(self, initial_state, final_states):
+        """
+        Return the same machine with other initial and final states, sharing the compiled table.
+        """
+        machine = object.__new__(Machine)
+        machine._set(
+            transitions=self.transitions,
+            table=self.table,
+            initial_state=initial_state,
+            final_states=frozenset(final_states),
+            reject_states=self.reject_states,
+            _rules=self._rules,
+            _simulators=self._simulators,
+            _lockstep=self._lockstep,
+            _doomed={},
+            _stops={},
+        )
+        machine._set(_hash=hash(machine._key()))
+        return machine
+
+    def for_direction(self, direction):
+        """
+        Return the machine set up for runs in `direction`: itself for forward
+        runs, and for backward runs the machine that starts from
+        BACKWARD_INITIAL_STATE and accepts on returning to the initial state.
+        """
+        if direction == "b":
+            return self.with_states(BACKWARD_INITIAL_STATE, [self.initial_state])
+        return self
+
+    def run(self, **options):
+        """
+        Start a run of this machine; `options` are passed on to `pda.Run`.
+        """
+        from pda import Run
+
+        return Run(self, **options)
+
+    def default_budgets(self, max_steps=None, max_stack=None):
+        """
+        Return the (max_steps, max_stack) budgets for runs of this machine:
+        the ones given, or `utils.DEFAULT_MAX_STEPS` and
+        `utils.DEFAULT_MAX_STACK` if neither is given and the machine has
+        epsilon cycles, which could otherwise loop forever.
+
+        >>> transitions = {"f": {"q0": {("", ""): ("q1", "")}, "q1": {("", ""): ("q0", "")}}, "b": {}}
+        >>> Machine(transitions).default_budgets() == (utils.DEFAULT_MAX_STEPS, utils.DEFAULT_MAX_STACK)
+        True
+        >>> Machine(transitions).default_budgets(max_stack=10)
+        (None, 10)
+        """
+        has_cycles = any(self.table.epsilon_cycles.values())
+        if max_steps is None and max_stack is None and has_cycles:
+            return utils.DEFAULT_MAX_STEPS, utils.DEFAULT_MAX_STACK
+        return max_steps, max_stack
+
+    def simulator(self, direction, stop_states=frozenset()):
+        """
+        Return the generated simulator for one direction that halts in
+        `stop_states`, see `codegen`.
+        """
+        key = (direction, stop_states)
+        simulator = self._simulators.get(key)
+        if simulator is None:
+            simulator = self._simulators[key] = compile_simulator(
+                self.transitions, direction, stop_states, self.table
+            )
+        return simulator
+
+    def lockstep_table(self, direction):
+        """
+        Return the transition table for one direction as NumPy arrays, see
+        `lockstep.LockstepTable`. It is built on first use and then shared by
+        every lockstep simulation of the machine.
+        """
+        lockstep = self._lockstep.get(direction)
+        if lockstep is None:
+            from lockstep import LockstepTable
+
+            lockstep = self._lockstep[direction] = LockstepTable(self.table, direction)
+        return lockstep
+
+    def analysis(self) -> Analysis:
+        """
+        Analyze the machine as loaded, for forward runs from its initial state
+        and backward runs set up by `for_direction`, see `analysis.analyze`.
+        """
+        backward = self.for_direction("b")
+        return analyze(
+            self.transitions,
+            {"f": self.initial_state, "b": backward.initial_state},
+            {"f": self.final_states, "b": backward.final_states},
+        )
+
+    def minimized(self):
+        """
+        Return the machine without the rules that can never fire, and how many
+        were removed, see `analysis.minimize`.
+
+        >>> transitions = {
+        ...     "f": {
+        ...         "q0": {("a", ""): ("qacc", ""), ("a", "X"): ("q1", "")},
+        ...         "q1": {("b", ""): ("qacc", "")},
+        ...     },
+        ...     "b": {},
+        ... }
+        >>> machine, removed = Machine(transitions).minimized()
+        >>> removed, machine.table.states
+        (2, ['q0', 'qacc'])
+        """
+        transitions, removed = minimize(self.transitions, self.analysis())
+        machine = Machine(
+            transitions, self.initial_state, self.final_states, self.reject_states
+        )
+        return machine, removed
+
+    def doomed_states(self, direction):
+        """
+        Return the states from which a run in `direction` can no longer reach
+        one of this machine's final states, see `analysis.doomed_states`.
+        """
+        doomed = self._doomed.get(direction)
+        if doomed is None:
+            dir_transitions = self.transitions.get(direction, {})
+            doomed = self._doomed[direction] = doomed_states(
+                dir_transitions, self.final_states, shadowed_rules(dir_transitions)
+            )
+        return doomed
+
+    def stop_states(self, direction, reject_early=False, accept_early=False):
+        """
+        Return the states in which a run in `direction` halts before its input
+        is used up: the reject states, plus the doomed states with
+        `reject_early` and the final states with `accept_early`. Only states
+        the machine mentions are included, so the set is usually empty.
+
+        >>> transitions = {"f": {"q0": {("a", ""): ("qrej", ""), ("b", ""): ("qacc", "")}}, "b": {}}
+        >>> sorted(Machine(transitions).stop_states("f", accept_early=True))
+        ['qacc', 'qrej']
+        """
+        key = (direction, reject_early, accept_early)
+        stops = self._stops.get(key)
+        if stops is None:
+            stops = set(self.reject_states)
+            if reject_early:
+                stops |= self.doomed_states(direction)
+            if accept_early:
+                stops |= self.final_states
+            stops = self._stops[key] = frozenset(
+                stops.intersection(self.table.state_ids)
+            )
+        return stops
+
+    def validation_report(self) -> utils.ValidationReport:
+        """
+        Check the machine for reversibility, see `utils.validation_report`.
+        """
+        return utils.validation_report(
+            self.transitions,
+            self.initial_state,
+            self.final_states,
+            self.reject_states,
+        )
+
+    def _key(self):
+        return (
+            self._rules,
+            self.initial_state,
+            self.final_states,
+            self.reject_states,
+        )
+
+    def __eq__(self, other):
+        if not isinstance(other, Machine):
+            return NotImplemented
+        return self._key() == other._key()
+
+    def __hash__(self):
+        return self._hash
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Machine is immutable.")
+
+    def __delattr__(self, name):
+        raise AttributeError("Machine is immutable.")
+
+    def __reduce__(self):
+        # Read-only views cannot be pickled, so rebuild from plain dicts
+        return (
+            Machine,
+            (
+                _thaw(self.transitions),
+                self.initial_state,
+                sorted(self.final_states),
+                sorted(self.reject_states),
+                self.table,
+            ),
+        )
+
+    def __repr__(self):
+        return (
+            f"Machine(initial_state={self.initial_state!r}, "
+            f"final_states={sorted(self.final_states)!r}, "
+            f"reject_states={sorted(self.reject_states)!r}, "
+            f"states={len(self.table.states)})"
+        )
@@ -0,0 +1,207 @@
+import time
+from collections import deque
+from typing import NamedTuple
+
+from pda import SimulationLimitError
+
+# Defaults for the limits of `search`
+DEFAULT_MAX_CONFIGURATIONS = 1_000_000
+
+
+class SearchResult(NamedTuple):
+    """
+    Outcome of `search`.
+
+    For an accepted input, state and stack are the accepting configuration and
+    path lists the transitions that lead to it from the initial configuration,
+    as (fromState, inputChar, stackChar, toState, stackChange) tuples.
+    For a rejected input they are None. explored counts the distinct
+    configurations visited.
+    """
+
+    accepted: bool
+    state: str | None
+    stack: list[str] | None
+    path: list[tuple[str, str, str, str, str]] | None
+    explored: int
+
+
+def _index_rules(dir_transitions):
+    """
+    Group the rules of each state by input character ("" for epsilon rules).
+    """
+    rules = {}
+    for from_state, transitions_for_state in dir_transitions.items():
+        by_input = rules.setdefault(from_state, {})
+        for (input_char, stack_char), (
+            to_state,
+            stack_change,
+        ) in transitions_for_state.items():
+            by_input.setdefault(input_char, []).append(
+                (stack_char, to_state, stack_change)
+            )
+    return rules
+
+
+def search(
+    transitions,
+    input_string,
+    direction,
+    initial_state,
+    final_states,
+    max_configurations=DEFAULT_MAX_CONFIGURATIONS,
+    max_stack=None,
+    time_limit=None,
+):
+    """
+    Decide whether the machine accepts `input_string` by exploring every
+    applicable transition breadth-first, instead of committing to the first
+    match as `PDA.simulate` does. The machine does not have to be
+    deterministic or reversible.
+
+    A configuration is (state, input position, stack). Stacks are hash-consed:
+    each distinct stack is a node (top symbol, rest, depth) with an int id,
+    so configurations compare and hash in O(1) and every configuration is
+    visited at most once, which also cuts epsilon cycles that do not grow
+    the stack. The input is accepted when it is fully consumed in one of
+    `final_states`; the shortest such run is reported as the witness.
+
+    Args:
+        transitions (dict): The PDA transitions, as returned by `utils.parse_transitions`.
+        input_string (str): The input, already reversed for backward runs.
+        direction (str): 'f' or 'b'.
+        initial_state (str): The state to start from.
+        final_states (Iterable[str]): The accepting states.
+        max_configurations (int): Maximum number of configurations to store.
+        max_stack (int): Maximum stack depth, None for unbounded.
+        time_limit (float): Maximum number of seconds to search, None for unbounded.
+
+    Raises:
+        SimulationLimitError: If a limit is reached before the search is decided.
+            Branches deeper than `max_stack` are pruned, so this is only raised
+            for the stack budget when no other branch accepts.
+
+    The machine below must guess where the middle of a palindrome is, so the
+    first-match strategy of `simulate` cannot accept it:
+
+    >>> transitions = {
+    ...     "f": {
+    ...         "q0": {("", ""): ("q1", "$")},
+    ...         "q1": {("a", ""): ("q1", "a"), ("b", ""): ("q1", "b"), ("", ""): ("q2", "")},
+    ...         "q2": {("a", "a"): ("q2", ""), ("b", "b"): ("q2", ""), ("", "$"): ("qacc", "")},
+    ...     },
+    ...     "b": {},
+    ... }
+    >>> result = search(transitions, "abba", "f", "q0", ["qacc"])
+    >>> result.accepted, result.state, result.stack
+    (True, 'qacc', [])
+    >>> [(from_state, input_char, to_state) for from_state, input_char, _, to_state, _ in result.path]
+    [('q0', '', 'q1'), ('q1', 'a', 'q1'), ('q1', 'b', 'q1'), ('q1', '', 'q2'), ('q2', 'b', 'q2'), ('q2', 'a', 'q2'), ('q2', '', 'qacc')]
+    >>> search(transitions, "abab", "f", "q0", ["qacc"]).accepted
+    False
+
+    >>> transitions = {"f": {"q0": {("", ""): ("q0", "X")}}, "b": {}}
+    >>> search(transitions, "a", "f", "q0", ["q1"], max_stack=100)
+    Traceback (most recent call last):
+        ...
+    pda.SimulationLimitError: Search pruned runs beyond the stack budget of 100 without accepting (101 configurations).
+    """
+    rules = _index_rules(transitions.get(direction, {}))
+    final_states = set(final_states)
+    deadline = None if time_limit is None else time.monotonic() + time_limit
+
+    # Hash-consed stacks: node id -> (top symbol, rest id, depth), id 0 is empty
+    nodes = [("", 0, 0)]
+    node_ids = {}
+
+    def push(stack_id, symbol):
+        key = (symbol, stack_id)
+        node_id = node_ids.get(key)
+        if node_id is None:
+            node_id = node_ids[key] = len(nodes)
+            nodes.append((symbol, stack_id, nodes[stack_id][2] + 1))
+        return node_id
+
+    start = (initial_state, 0, 0)
+    # configuration -> (previous configuration, transition taken)
+    parents = {start: None}
+    queue = deque([start])
+    n = len(input_string)
+    expanded = 0
+    pruned = False
+
+    while queue:
+        configuration = queue.popleft()
+        state, position, stack_id = configuration
+        if position == n and state in final_states:
+            return _accept(configuration, parents, nodes)
+
+        expanded += 1
+        if deadline is not None and expanded % 1024 == 0:
+            if time.monotonic() > deadline:
+                raise SimulationLimitError(
+                    f"Search exceeded the time limit of {time_limit}s "
+                    f"after {len(parents)} configurations."
+                )
+
+        by_input = rules.get(state)
+        if not by_input:
+            continue
+        top = nodes[stack_id][0]
+        candidates = [("", by_input.get("", ()))]
+        if position < n:
+            char = input_string[position]
+            candidates.append((char, by_input.get(char, ())))
+
+        for input_char, state_rules in candidates:
+            next_position = position + 1 if input_char else position
+            for stack_char, to_state, stack_change in state_rules:
+                if stack_char:
+                    if stack_id == 0 or top != stack_char:
+                        continue
+                    next_stack = nodes[stack_id][1]
+                else:
+                    next_stack = stack_id
+                for symbol in reversed(stack_change):
+                    next_stack = push(next_stack, symbol)
+
+                next_configuration = (to_state, next_position, next_stack)
+                if next_configuration in parents:
+                    continue
+                if max_stack is not None and nodes[next_stack][2] > max_stack:
+                    pruned = True
+                    continue
+                if len(parents) >= max_configurations:
+                    raise SimulationLimitError(
+                        f"Search exceeded the budget of {max_configurations} configurations."
+                    )
+                parents[next_configuration] = (
+                    configuration,
+                    (state, input_char, stack_char, to_state, stack_change),
+                )
+                queue.append(next_configuration)
+
+    if pruned:
+        raise SimulationLimitError(
+            f"Search pruned runs beyond the stack budget of {max_stack} "
+            f"without accepting ({len(parents)} configurations)."
+        )
+    return SearchResult(False, None, None, None, len(parents))
+
+
+def _accept(configuration, parents, nodes):
+    path = []
+    link = parents[configuration]
+    while link is not None:
+        configuration_before, transition = link
+        path.append(transition)
+        link = parents[configuration_before]
+    path.reverse()
+
+    state, _, stack_id = configuration
+    stack = []
+    while stack_id:
+        symbol, stack_id, _ = nodes[stack_id]
+        stack.append(symbol)
+    stack.reverse()
+    return SearchResult(True, state, stack, path, len(parents))
@@ -1,39 +1,354 @@
+import re
+from itertools import islice
+from typing import NamedTuple
+
 import utils
+from machine import Machine
+from stacks import RunLengthStack, make_stack
+
+
+class SimulationLimitError(RuntimeError):
+    """
+    Raised when a run exceeds the step or stack budget of its PDA.
+    """
+
+
+# A run of copies of one character
+_RUN = re.compile(r"(.)\1*", re.DOTALL)
+
+# Simulation engines accepted by PDA
+ENGINES = ["table", "codegen"]
 
 
-class PDA:
+class Checkpoint(NamedTuple):
+    """
+    Snapshot of a run taken by `PDA.checkpoint`.
+    """
+
+    state: str
+    stack: object
+    position: int
+    steps: int
+    last_consumed_char: str
+    halted: bool
+
+
+class Run:
+    """
+    One run of a `machine.Machine`: the current state, stack and input
+    position, plus the options of the run. Everything about the machine
+    itself, including the compiled table, is shared with every other run of
+    the same machine, so a run costs little more than its stack. Runs are
+    usually started with `Machine.run`; `PDA` builds a machine and a run in
+    one go.
+    """
+
+    __slots__ = (
+        "machine",
+        "current_state",
+        "stack",
+        "last_consumed_char",
+        "halted",
+        "steps",
+        "position",
+        "input",
+        "direction",
+        "tracer",
+        "max_steps",
+        "max_stack",
+        "stack_backend",
+        "engine",
+        "reject_early",
+        "accept_early",
+    )
+
     def __init__(
         self,
-        transitions: dict,
-        initial_state: str,
-        final_states: list[str],
-        reject_states: list[str],
+        machine: Machine,
+        tracer=None,
+        max_steps=None,
+        max_stack=None,
+        stack_backend="list",
+        engine="table",
+        reject_early=False,
+        accept_early=False,
     ):
         """
-        Initialize the PDA with transitions, initial state, final, and reject states.
+        Start a run of `machine` in its initial state with an empty stack.
+
+        `tracer` is an optional callable invoked before every step as
+        tracer(current_state, char, direction, stack); see `tracing` for the
+        built-in ones. With no tracer a step does no tracing work at all.
+
+        `max_steps` and `max_stack` bound the number of steps of a run and the
+        stack depth; exceeding either raises SimulationLimitError instead of
+        letting an epsilon loop run forever. None means unbounded.
+
+        `stack_backend` selects how the stack is stored: "list" (a list of
+        symbols), "array" (packed symbol ids), "rle" (run-length encoded
+        symbol ids, O(1) memory per run of one symbol) or "linked" (persistent
+        nodes, making checkpoints O(1)); see `stacks`.
+        The compact backends still iterate, index and print like a list.
+
+        `engine` selects how `simulate` runs: "table" steps through the
+        compiled table, "codegen" runs Python generated for this machine (see
+        `codegen`), which is faster but supports neither a tracer nor a stack
+        backend other than "list". `step`, `feed` and `simulate_stream` always
+        use the table.
+
+        A run halts and rejects as soon as it enters a reject state. With
+        `reject_early` it also does so in any state from which no final state
+        can be reached (see `Machine.doomed_states`), and with `accept_early`
+        it halts and accepts as soon as it enters a final state, whatever the
+        rest of the input. The final state and stack are then those of that
+        moment, and `position` and `steps` tell how much input and how many
+        steps were used.
         """
-        self.transitions = transitions
+        if engine not in ENGINES:
+            raise ValueError(f"Invalid engine: {engine}")
+        if engine == "codegen" and (tracer is not None or stack_backend != "list"):
+            raise ValueError(
+                "The codegen engine supports neither tracing nor compact stacks."
+            )
+        self.machine = machine
+        self.stack_backend = stack_backend
+        self.current_state = machine.initial_state
+        self.stack = make_stack(stack_backend, machine.table.stack_symbols)
+        self.last_consumed_char = None
+        self.halted = False
+        self.steps = 0
+        # Input characters consumed by the current run, and the run itself, for rewind
+        self.position = 0
+        self.input = None
+        self.direction = None
+        self.tracer = tracer
+        self.max_steps = max_steps
+        self.max_stack = max_stack
+        self.engine = engine
+        self.reject_early = reject_early
+        self.accept_early = accept_early
+
+    # The machine definition, read-only
+    @property
+    def transitions(self):
+        return self.machine.transitions
+
+    @property
+    def table(self):
+        return self.machine.table
+
+    @property
+    def final_states(self):
+        return self.machine.final_states
+
+    @property
+    def reject_states(self):
+        return self.machine.reject_states
+
+    def reset(self, initial_state=None):
+        """
+        Return the run to `initial_state` (by default the machine's) with an empty stack.
+        The compiled transition table is kept, so one run can be reused for many inputs.
+
+        >>> transitions = {
+        ...     "f": {
+        ...         "q0": {("0", ""): ("q1", "1")},
+        ...     },
+        ...     "b": {}
+        ... }
+        >>> pda = PDA(transitions, initial_state="q0", final_states=["q1"], reject_states=[])
+        >>> pda.stack = ["1"]
+        >>> pda.current_state = "q1"
+        >>> pda.reset("q0")
+        >>> pda.current_state, pda.stack
+        ('q0', [])
+        """
+        if initial_state is None:
+            initial_state = self.machine.initial_state
         self.current_state = initial_state
-        self.stack = []
-        self.final_states = set(final_states)
-        self.reject_states = set(reject_states)
+        self.stack = make_stack(self.stack_backend, self.machine.table.stack_symbols)
         self.last_consumed_char = None
+        self.halted = False
+        self.steps = 0
+        self.position = 0
+        self.input = None
+        self.direction = None
+
+    def checkpoint(self):
+        """
+        Take a snapshot of the current run that `restore` can return to.
+        With the "linked" stack backend this is O(1) and shares the stack with
+        the live run; the other backends copy their stack.
+        """
+        if isinstance(self.stack, list):
+            stack = self.stack[:]
+        else:
+            stack = self.stack.snapshot()
+        return Checkpoint(
+            self.current_state,
+            stack,
+            self.position,
+            self.steps,
+            self.last_consumed_char,
+            self.halted,
+        )
+
+    def restore(self, checkpoint):
+        """
+        Return the run to a snapshot taken by `checkpoint`. A checkpoint can be restored any number of times.
+
+        >>> transitions = {
+        ...     "f": {
+        ...         "q0": {("0", ""): ("q0", "1"), ("1", "1"): ("q1", "")},
+        ...         "q1": {("1", "1"): ("q1", "")},
+        ...     },
+        ...     "b": {}
+        ... }
+        >>> pda = PDA(transitions, initial_state="q0", final_states=["q1"], reject_states=[], stack_backend="linked")
+        >>> pda.feed("00", "f")
+        True
+        >>> saved = pda.checkpoint()
+        >>> pda.feed("011", "f")
+        True
+        >>> pda.current_state, pda.stack
+        ('q1', ['1'])
+        >>> pda.restore(saved)
+        >>> pda.current_state, pda.stack, pda.position
+        ('q0', ['1', '1'], 2)
+        """
+        (
+            self.current_state,
+            stack,
+            self.position,
+            self.steps,
+            self.last_consumed_char,
+            self.halted,
+        ) = checkpoint
+        if isinstance(self.stack, list):
+            self.stack = stack[:]
+        else:
+            self.stack.restore(stack)
+
+    def rewind(self, n_steps, input_string=None):
+        """
+        Undo up to `n_steps` steps of the current run by applying the machine's
+        transitions in the opposite direction, so no per-step history is kept.
+        The characters to un-read are taken from `input_string` (by default the
+        input of the last `simulate` call) just before the current position.
+        Rewinding stops early if no reverse transition applies, or if more
+        than one does, as it cannot tell which step was taken. Reverse steps
+        do not count against `max_steps` or `max_stack`.
+        Returns the number of steps rewound.
+
+        The result is only the true earlier configuration for reversible
+        machines, see `is_reversible`.
+
+        >>> transitions = {
+        ...     "f": {
+        ...         "q0": {("a", ""): ("q1", "X")},
+        ...         "q1": {("b", "X"): ("q2", "")},
+        ...     },
+        ...     "b": {
+        ...         "q1": {("a", "X"): ("q0", "")},
+        ...         "q2": {("b", ""): ("q1", "X")},
+        ...     },
+        ... }
+        >>> pda = PDA(transitions, initial_state="q0", final_states=["q2"], reject_states=[], max_steps=2)
+        >>> pda.simulate("ab", "f")
+        ('q2', [], True)
+        >>> pda.rewind(1)
+        1
+        >>> pda.current_state, pda.stack, pda.position
+        ('q1', ['X'], 1)
+        >>> pda.rewind(5)
+        1
+        >>> pda.current_state, pda.stack, pda.position
+        ('q0', [], 0)
+
+        Backward, "ep,$" could undo the first step or ")" un-read, so rewinding stops:
+
+        >>> transitions = {
+        ...     "f": {
+        ...         "q0": {("", ""): ("q1", "$")},
+        ...         "q1": {("(", ""): ("q1", "("), (")", "("): ("q1", "")},
+        ...     },
+        ...     "b": {"q1": {("", "$"): ("q0", ""), ("(", "("): ("q1", ""), (")", ""): ("q1", "(")}},
+        ... }
+        >>> pda = PDA(transitions, initial_state="q0", final_states=["q1"], reject_states=[], max_steps=3)
+        >>> pda.simulate("()", "f")
+        ('q1', ['$'], True)
+        >>> pda.rewind(3), pda.current_state, pda.stack, pda.position, pda.steps
+        (0, 'q1', ['$'], 2, 3)
+        """
+        if input_string is None:
+            input_string = self.input
+        if input_string is None:
+            raise ValueError("No input to rewind over; pass input_string.")
+        if self.direction is None:
+            return 0
+        reverse = "b" if self.direction == "f" else "f"
+
+        # Earlier configurations were within the budgets
+        steps, max_steps, max_stack = self.steps, self.max_steps, self.max_stack
+        self.max_steps = self.max_stack = None
+        rewound = 0
+        try:
+            while rewound < n_steps:
+                char = input_string[self.position - 1] if self.position > 0 else ""
+                if self._reverse_rules(char, reverse) != 1:
+                    break
+                self.step(char, reverse)
+                # A reverse transition that reads the character un-reads it
+                if char != "" and char == self.last_consumed_char:
+                    self.position -= 1
+                rewound += 1
+        finally:
+            self.max_steps, self.max_stack = max_steps, max_stack
+            self.steps = steps - rewound
+        self.halted = False
+        return rewound
+
+    def _reverse_rules(self, char, direction):
+        """
+        Count the rules of the current state that apply to `char` (or to no
+        input) and the top of the stack in `direction`.
+        """
+        transitions_for_state = self.transitions.get(direction, {}).get(
+            self.current_state, {}
+        )
+        top = self.stack[-1] if len(self.stack) else ""
+        return sum(
+            1
+            for input_char, stack_char in transitions_for_state
+            if input_char in ("", char) and stack_char in ("", top)
+        )
 
     def is_reversible(self):
         """
         Verify if the PDA is reversible.
-        Returns True if reversible, False otherwise.
+        Returns a `utils.ValidationReport` listing every violation found; the
+        report is truthy if the PDA is reversible and falsy otherwise.
+
+        >>> transitions = {
+        ...     "f": {
+        ...         "q0": {("a", ""): ("q1", "X")},
+        ...     },
+        ...     "b": {},
+        ... }
+        >>> pda = PDA(transitions, initial_state="q0", final_states=["q1"], reject_states=[])
+        >>> report = pda.is_reversible()
+        >>> bool(report)
+        False
+        >>> print(report)
+        Missing reverse transition for forward transition: 'q0' => 'q1' on input 'a' with stack ''.
         """
-        try:
-            utils.validate(
-                self.transitions,
-                self.current_state,
-                self.final_states,
-                self.reject_states,
-            )
-        except ValueError as e:
-            print(e)
-            return False
+        machine = self.machine
+        return utils.validation_report(
+            machine.transitions,
+            self.current_state,
+            machine.final_states,
+            machine.reject_states,
+        )
 
     def _has_epsilon_transitions(self, direction):
         """
@@ -61,15 +376,39 @@ class PDA:
         >>> pda._has_epsilon_transitions("f")
         False
         """
-        if direction not in self.transitions:
+        epsilon = self.machine.table.epsilon.get(direction)
+        if epsilon is None:
             return False
 
-        state_transitions = self.transitions[direction].get(self.current_state, {})
-        for (input_char, _), _ in state_transitions.items():
-            if input_char == "":  # Epsilon transition
-                return True
+        state_id = self.machine.table.state_ids.get(self.current_state)
+        return state_id is not None and epsilon[state_id]
+
+    def _limit_exceeded(self, budget, direction):
+        message = (
+            f"Exceeded the {budget} in state '{self.current_state}' "
+            f"(direction '{direction}', {self.steps} steps, stack depth {len(self.stack)})."
+        )
+        for cycle in self.machine.table.epsilon_cycles.get(direction, []):
+            if self.current_state in cycle:
+                message += f" The state is on the epsilon cycle {' -> '.join(cycle)}."
+                break
+        raise SimulationLimitError(message)
 
-        return False
+    def _stop_states(self, direction):
+        return self.machine.stop_states(direction, self.reject_early, self.accept_early)
+
+    def _accepted(self):
+        # A halted run has only accepted if it stopped early in a final state
+        return self.current_state in self.machine.final_states and (
+            not self.halted or self.accept_early
+        )
+
+    def _start_run(self, direction, input_string=None):
+        self.halted = False
+        self.steps = 0
+        self.position = 0
+        self.input = input_string
+        self.direction = direction
 
     def simulate(self, input_string, direction):
         """
@@ -108,27 +447,264 @@ class PDA:
         >>> pda = PDA(transitions, initial_state="q0", final_states=["q2"], reject_states=[])
         >>> pda.simulate("1", "f")
         ('q1', ['1'], False)
+
+        >>> pda = PDA(transitions, initial_state="q0", final_states=["q2"], reject_states=[], stack_backend="rle")
+        >>> pda.simulate("1", "f")
+        ('q1', ['1'], False)
+
+        >>> pda = PDA(transitions, initial_state="q0", final_states=["q2"], reject_states=[], engine="codegen")
+        >>> pda.simulate("1", "f")
+        ('q1', ['1'], False)
+
+        >>> transitions = {
+        ...     "f": {
+        ...         "q0": {("", ""): ("q0", "1")},
+        ...     },
+        ...     "b": {}
+        ... }
+        >>> pda = PDA(transitions, initial_state="q0", final_states=["q2"], reject_states=[], max_stack=1000)
+        >>> pda.simulate("", "f")
+        Traceback (most recent call last):
+            ...
+        pda.SimulationLimitError: Exceeded the stack budget of 1000 in state 'q0' (direction 'f', 1001 steps, stack depth 1001). The state is on the epsilon cycle q0.
+
+        A run stops in a reject state, and with `accept_early` in a final state:
+
+        >>> transitions = {
+        ...     "f": {
+        ...         "q0": {("0", ""): ("q0", "0"), ("1", ""): ("qrej", ""), ("2", ""): ("qacc", "")},
+        ...         "qrej": {("", ""): ("q0", "")},
+        ...         "qacc": {("", ""): ("q0", "")},
+        ...     },
+        ...     "b": {}
+        ... }
+        >>> pda = PDA(transitions, initial_state="q0", final_states=["qacc"], reject_states=["qrej"])
+        >>> pda.simulate("0100", "f"), pda.position, pda.steps
+        (('qrej', ['0'], False), 2, 2)
+        >>> pda = PDA(transitions, initial_state="q0", final_states=["qacc"], reject_states=["qrej"], accept_early=True)
+        >>> pda.simulate("0200", "f"), pda.position, pda.steps
+        (('qacc', ['0'], True), 2, 2)
+        """
+        self._start_run(direction, input_string)
+        if self.engine == "codegen":
+            return self._simulate_generated(input_string, direction)
+        self.feed(input_string, direction)
+        return self.finish(direction)
+
+    def _simulate_generated(self, input_string, direction):
+        simulator = self.machine.simulator(direction, self._stop_states(direction))
+        (
+            self.current_state,
+            self.stack,
+            self.position,
+            self.steps,
+            self.halted,
+        ) = simulator.run(
+            input_string, self.current_state, self.stack, self.max_steps, self.max_stack
+        )
+        return self.current_state, self.stack, self._accepted()
+
+    def feed(self, chunk, direction):
+        """
+        Consume the next chunk of input, taking any epsilon moves that come before each character.
+        Returns False once the PDA has halted on a character with no valid transition; later
+        chunks are then ignored. Call `finish` after the last chunk to get the result.
+        The chunks are not kept, so memory is bounded by the stack depth rather than the input length.
+
+        >>> transitions = {
+        ...     "f": {
+        ...         "q0": {("", ""): ("q1", "$")},
+        ...         "q1": {("(", ""): ("q1", "("), (")", "("): ("q1", ""), ("", "$"): ("q2", "")},
+        ...     },
+        ...     "b": {}
+        ... }
+        >>> pda = PDA(transitions, initial_state="q0", final_states=["q2"], reject_states=[])
+        >>> pda.feed("((", "f")
+        True
+        >>> pda.stack
+        ['$', '(', '(']
+        >>> pda.feed("))", "f")
+        True
+        >>> pda.finish("f")
+        ('q2', [], True)
+
+        >>> pda.reset("q0")
+        >>> pda.feed("())", "f")
+        False
+        >>> pda.feed("(", "f")
+        False
+        >>> pda.finish("f")
+        ('q2', [], False)
+
+        With early rejection, a run stops reading once it cannot accept any more:
+
+        >>> transitions["f"]["q1"][("x", "")] = ("q3", "")
+        >>> transitions["f"]["q3"] = {("", ""): ("q3", "")}
+        >>> pda = PDA(transitions, initial_state="q0", final_states=["q2"], reject_states=[], reject_early=True)
+        >>> pda.feed("(x()", "f"), pda.position
+        (False, 2)
+        >>> pda.finish("f")
+        ('q3', ['$', '('], False)
+        """
+        if self.halted:
+            return False
+
+        self.direction = direction
+        step = self.step
+        # Runs of one character over a self-loop are applied at once, unless a
+        # tracer has to see every step
+        self_loops = self.machine.table.self_loops.get(direction)
+        if self.tracer is not None:
+            self_loops = None
+        stop = self._stop_states(direction)
+        chars = enumerate(chunk)
+        previous = None
+        for index, char in chars:
+            if stop and self.current_state in stop:
+                self.halted = True
+                self.position += index
+                return False
+            if char == previous and self_loops:
+                repeated = self._repeat_self_loop(chunk, index, direction, self_loops)
+                if repeated:
+                    # Skip the rest of the run, which has been applied already
+                    next(islice(chars, repeated - 1, repeated - 1), None)
+                    continue
+            previous = char
+
+            # Take epsilon moves until the character is consumed
+            while True:
+                if not step(char, direction):  # If no valid transition exists
+                    self.halted = True
+                    self.position += index
+                    return False
+
+                # Only a consuming transition advances to the next character
+                if self.last_consumed_char == char:
+                    break
+                if stop and self.current_state in stop:
+                    self.halted = True
+                    self.position += index
+                    return False
+
+        self.position += len(chunk)
+        return True
+
+    def _repeat_self_loop(self, chunk, index, direction, self_loops):
         """
-        input_index = 0
+        Apply the run of copies of chunk[index] starting there at once if the
+        current cell is one of `self_loops` (see `table.TransitionTable`),
+        exactly as that many steps would. Stops short of the step and stack
+        budgets, so the step that exceeds one raises as usual.
+        Returns the number of characters consumed.
+        """
+        table = self.machine.table
+        stack = self.stack
+        is_list = isinstance(stack, list)
+        if is_list:
+            top_id = table.stack_ids.get(stack[-1], 0) if stack else 0
+        else:
+            top_id = stack.peek()
+        n_stack = len(table.stack_symbols)
+        cell_index = (
+            table.state_ids[self.current_state] * len(table.input_symbols)
+            + table.input_ids[chunk[index]]
+        ) * n_stack + top_id
+        if cell_index not in self_loops:
+            return 0
+
+        count = _RUN.match(chunk, index).end() - index
+        if self.max_steps is not None:
+            count = min(count, self.max_steps - self.steps)
+        _, pop, push, _ = table.cells[direction][cell_index]
+        if push:
+            if self.max_stack is not None:
+                count = min(count, self.max_stack - len(stack))
+            if count <= 0:
+                return 0
+            if is_list:
+                stack.extend([table.stack_symbols[top_id]] * count)
+            else:
+                stack.push(top_id, count)
+        elif is_list:
+            # Pop while the same symbol stays on top
+            symbol = table.stack_symbols[pop]
+            popped = 0
+            while (
+                popped < count and popped < len(stack) and stack[-1 - popped] == symbol
+            ):
+                popped += 1
+            count = popped
+            if count <= 0:
+                return 0
+            del stack[-count:]
+        elif isinstance(stack, RunLengthStack):
+            # The top run is all copies of the popped symbol
+            count = min(count, stack.counts[-1])
+            if count <= 0:
+                return 0
+            stack.pop(count)
+        else:
+            popped = 0
+            while popped < count and stack.peek() == pop:
+                stack.pop()
+                popped += 1
+            count = popped
 
-        while input_index < len(input_string) or self._has_epsilon_transitions(
-            direction
-        ):
-            # Get the current input character or epsilon
-            char = input_string[input_index] if input_index < len(input_string) else ""
+        self.steps += count
+        return count
 
-            # Try to make a step
-            proceed = self.step(char, direction)
+    def finish(self, direction):
+        """
+        Take the remaining epsilon moves after the end of the input and return
+        the final state, stack content, and whether an accept state was reached, as `simulate` does.
+        """
+        stop = self._stop_states(direction)
+        while not self.halted:
+            if stop and self.current_state in stop:
+                self.halted = True
+            elif not self._has_epsilon_transitions(direction):
+                break
+            elif not self.step("", direction):
+                self.halted = True
+        return self.current_state, self.stack_list(), self._accepted()
 
-            if not proceed:  # If no valid transition exists
-                return self.current_state, self.stack, False
+    def stack_list(self):
+        """
+        Return the stack as a list of symbols, bottom first, whatever the backend.
+        The list backend returns the stack itself.
+        """
+        if isinstance(self.stack, list):
+            return self.stack
+        return self.stack.to_list()
 
-            # Advance the input index only if the transition consumed the input character
-            if char != "" and char == self.last_consumed_char:
-                input_index += 1
+    def simulate_stream(self, source, direction, chunk_size=utils.CHUNK_SIZE):
+        """
+        Simulate the PDA over input read incrementally from `source`, which is
+        either a file object or an iterable of string chunks.
+        Regular files are memory-mapped and read `chunk_size` bytes at a time.
+        Returns the same result as `simulate` on the concatenated input.
 
-        # Check if the current state is an accept state
-        return self.current_state, self.stack, (self.current_state in self.final_states)
+        >>> import io
+        >>> transitions = {
+        ...     "f": {
+        ...         "q0": {("0", ""): ("q0", "1"), ("1", "1"): ("q1", "")},
+        ...         "q1": {("1", "1"): ("q1", "")},
+        ...     },
+        ...     "b": {}
+        ... }
+        >>> pda = PDA(transitions, initial_state="q0", final_states=["q1"], reject_states=[])
+        >>> pda.simulate_stream(io.StringIO("000111"), "f", chunk_size=4)
+        ('q1', [], True)
+        >>> pda.reset("q0")
+        >>> pda.simulate_stream(["00", "01", "1"], "f")
+        ('q1', ['1'], True)
+        """
+        self._start_run(direction)
+        for chunk in utils.read_chunks(source, chunk_size):
+            if not self.feed(chunk, direction):
+                break
+        return self.finish(direction)
 
     def step(self, char, direction):
         """
@@ -181,41 +757,102 @@ class PDA:
         'q0'
         >>> pda.stack
         []
+
+        >>> from tracing import PrintTracer
+        >>> pda = PDA(transitions, initial_state="q0", final_states=["q2"], reject_states=[], tracer=PrintTracer())
+        >>> pda.step("0", "f")
+        current_state: q0, char: 0, direction: f, stack: []
+        True
         """
-        print(
-            f"current_state: {self.current_state}, char: {char}, direction: {direction}, stack: {self.stack}"
-        )
-        if direction not in self.transitions:
+        if self.tracer is not None:
+            self.tracer(self.current_state, char, direction, self.stack)
+        table = self.machine.table
+        if direction not in table.cells:
+            return False
+
+        state_id = table.state_ids.get(self.current_state)
+        if state_id is None:
             return False
 
-        state_transitions = self.transitions[direction].get(self.current_state, {})
+        # Characters and stack symbols the machine never mentions can only
+        # match epsilon rules, which is exactly what id 0 selects
+        input_id = table.input_ids.get(char, 0)
+        stack = self.stack
+        is_list = isinstance(stack, list)
+        if is_list:
+            top_id = table.stack_ids.get(stack[-1], 0) if stack else 0
+        else:
+            top_id = stack.peek()
 
-        for (input_char, stack_char), (
-            next_state,
-            stack_change,
-        ) in state_transitions.items():
-            # Match input character and stack top
-            if (input_char == char or input_char == "") and (
-                (self.stack and stack_char == self.stack[-1]) or not stack_char
-            ):
-                # Update stack
+        cell = table.lookup(direction, state_id, input_id, top_id)
+        if cell is None:
+            # No valid transition found so
+            return False
+
+        next_state, pop, push, consumes = cell
+
+        # Update stack
+        if pop:
+            stack.pop()
+        if is_list:
+            for symbol in push:
+                stack.append(table.stack_symbols[symbol])
+        else:
+            for symbol in push:
+                stack.push(symbol)
+
+        # Update state
+        self.current_state = table.states[next_state]
+
+        # Enforce the run budgets
+        self.steps += 1
+        if self.max_steps is not None and self.steps > self.max_steps:
+            self._limit_exceeded(f"step budget of {self.max_steps}", direction)
+        if push and self.max_stack is not None and len(stack) > self.max_stack:
+            self._limit_exceeded(f"stack budget of {self.max_stack}", direction)
+
+        # Track whether input was consumed
+        # this is then used by simulate to determine whether to advance the input index
+        # as an epsilon transition does not consume input but still advances the state
+        self.last_consumed_char = char if consumes else ""
 
-                ## only pop if stack_char is not epsilon or if stack is not empty
-                if stack_char and self.stack and self.stack[-1] == stack_char:
-                    self.stack.pop()
-                ## only push if stack_change is not epsilon
-                if stack_change:
-                    self.stack.extend(reversed(stack_change))
+        return True
 
-                # Update state
-                self.current_state = next_state
 
-                # Track whether input was consumed
-                # this is then used by simulate to determine whether to advance the input index
-                # as an epsilon transition does not consume input but still advances the state
-                self.last_consumed_char = input_char
+class PDA(Run):
+    """
+    A run together with its own machine, built straight from the transitions.
+    See `Run` for the options; `table` is the compiled form of `transitions`,
+    compiled here when not given.
+    """
 
-                return True
+    __slots__ = ()
 
-        # No valid transition found so
-        return False
+    def __init__(
+        self,
+        transitions: dict,
+        initial_state: str,
+        final_states: list[str],
+        reject_states: list[str],
+        tracer=None,
+        max_steps=None,
+        max_stack=None,
+        stack_backend="list",
+        table=None,
+        engine="table",
+        reject_early=False,
+        accept_early=False,
+    ):
+        """
+        Initialize the PDA with transitions, initial state, final, and reject states.
+        """
+        super().__init__(
+            Machine(transitions, initial_state, final_states, reject_states, table),
+            tracer=tracer,
+            max_steps=max_steps,
+            max_stack=max_stack,
+            stack_backend=stack_backend,
+            engine=engine,
+            reject_early=reject_early,
+            accept_early=accept_early,
+        )
@@ -0,0 +1,217 @@
+import json
+import time
+from collections import Counter, defaultdict
+
+# Output formats of the command line --profile option
+PROFILE_FORMATS = ["table", "json"]
+
+
+def _depth_bucket(depth):
+    """
+    Return the stack depth histogram bucket of a depth: 0, 1, 2-3, 4-7, ...
+
+    >>> [_depth_bucket(depth) for depth in (0, 1, 2, 3, 4, 1000)]
+    ['0', '1', '2-3', '2-3', '4-7', '512-1023']
+    """
+    if depth < 2:
+        return str(depth)
+    low = 1 << (depth.bit_length() - 1)
+    return f"{low}-{2 * low - 1}"
+
+
+def _show(symbol):
+    return symbol if symbol else "ep"
+
+
+class Profiler:
+    """
+    Tracer (see `tracing`) that profiles the runs of a PDA instead of printing them.
+
+    For every step it counts the transition that fires, whether it is an
+    epsilon or a consuming move, the time until the next step (charged to the
+    state the step leaves) and the stack depth, kept as a peak and a
+    power-of-two histogram. A step with no valid transition counts as a halt.
+    The transition is resolved the way `PDA.step` picks it, and memoized per
+    (direction, state, character, stack top), so the per-step cost is a few
+    dict operations. Like any tracer it costs nothing when it is not installed.
+
+    Call `stop` with the final stack after a run so the last step is timed and
+    its stack depth is seen.
+
+    >>> from pda import PDA
+    >>> transitions = {
+    ...     "f": {
+    ...         "q0": {("", ""): ("q1", "$")},
+    ...         "q1": {("(", ""): ("q1", "("), (")", "("): ("q1", ""), ("", "$"): ("qacc", "")},
+    ...         "q2": {("", ""): ("q1", "")},
+    ...     },
+    ...     "b": {},
+    ... }
+    >>> profiler = Profiler(transitions)
+    >>> pda = PDA(transitions, "q0", ["qacc"], [], tracer=profiler)
+    >>> pda.simulate("(())", "f")
+    ('qacc', [], True)
+    >>> profiler.stop(pda.stack)
+    >>> profile = profiler.to_dict()
+    >>> profile["steps"], profile["consuming_moves"], profile["epsilon_moves"]
+    (6, 4, 2)
+    >>> profile["max_stack_depth"], profile["stack_depth_histogram"]
+    (3, {'0': 1, '1': 2, '2-3': 3})
+    >>> [(t["from"], t["input"], t["count"]) for t in profile["transitions"]]
+    [('q1', '(', 2), ('q1', ')', 2), ('q0', '', 1), ('q1', '', 1)]
+    >>> [(t["from"], t["to"]) for t in profile["unused_transitions"]]
+    [('q2', 'q1')]
+    """
+
+    def __init__(self, transitions, clock=time.perf_counter_ns):
+        self.transitions = transitions
+        self.clock = clock
+        # (direction, fromState, inputChar, stackChar) -> times fired
+        self.counts = Counter()
+        # (direction, state) -> [steps, nanoseconds]
+        self.states = defaultdict(lambda: [0, 0])
+        self.depths = Counter()
+        self.max_depth = 0
+        self.epsilon_moves = 0
+        self.consuming_moves = 0
+        self.halts = 0
+        self._resolved = {}
+        self._running = None
+        self._started = 0
+
+    def _resolve(self, key):
+        direction, state, char, top = key
+        for input_char, stack_char in self.transitions.get(direction, {}).get(
+            state, {}
+        ):
+            if input_char in (char, "") and stack_char in (top, ""):
+                return (direction, state, input_char, stack_char)
+        return None
+
+    def __call__(self, state, char, direction, stack):
+        now = self.clock()
+        if self._running is not None:
+            self._running[1] += now - self._started
+
+        depth = len(stack)
+        self.depths[depth] += 1
+        if depth > self.max_depth:
+            self.max_depth = depth
+
+        key = (direction, state, char, stack[-1] if depth else "")
+        rule = self._resolved.get(key, False)
+        if rule is False:
+            rule = self._resolved[key] = self._resolve(key)
+        if rule is None:
+            self.halts += 1
+        else:
+            self.counts[rule] += 1
+            if rule[2]:
+                self.consuming_moves += 1
+            else:
+                self.epsilon_moves += 1
+
+        running = self._running = self.states[(direction, state)]
+        running[0] += 1
+        self._started = self.clock()
+
+    def stop(self, stack=None):
+        """
+        Charge the time since the last step and record the final stack depth.
+        """
+        if self._running is not None:
+            self._running[1] += self.clock() - self._started
+            self._running = None
+        if stack is not None:
+            self.max_depth = max(self.max_depth, len(stack))
+
+    def _transitions(self, used):
+        rules = []
+        for direction, dir_transitions in self.transitions.items():
+            for from_state, transitions_for_state in dir_transitions.items():
+                for (input_char, stack_char), (
+                    to_state,
+                    stack_change,
+                ) in transitions_for_state.items():
+                    count = self.counts[(direction, from_state, input_char, stack_char)]
+                    if bool(count) == used:
+                        rules.append(
+                            {
+                                "direction": direction,
+                                "from": from_state,
+                                "input": input_char,
+                                "stack": stack_char,
+                                "to": to_state,
+                                "stack_change": stack_change,
+                                "count": count,
+                            }
+                        )
+        # Sorting is stable, so equally hot transitions stay in file order
+        rules.sort(key=lambda rule: -rule["count"])
+        return rules
+
+    def to_dict(self):
+        """
+        Return the profile as a JSON-serializable dict; times are in nanoseconds.
+        """
+        histogram = Counter()
+        for depth, count in sorted(self.depths.items()):
+            histogram[_depth_bucket(depth)] += count
+        return {
+            "steps": self.epsilon_moves + self.consuming_moves,
+            "consuming_moves": self.consuming_moves,
+            "epsilon_moves": self.epsilon_moves,
+            "halts": self.halts,
+            "max_stack_depth": self.max_depth,
+            "stack_depth_histogram": dict(histogram),
+            "states": [
+                {"direction": direction, "state": state, "steps": steps, "time_ns": ns}
+                for (direction, state), (steps, ns) in sorted(
+                    self.states.items(), key=lambda item: -item[1][1]
+                )
+            ],
+            "transitions": self._transitions(used=True),
+            "unused_transitions": self._transitions(used=False),
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+    def format_table(self):
+        """
+        Return the profile as human-readable tables, hottest entries first.
+        """
+        profile = self.to_dict()
+        lines = [
+            f"Steps: {profile['steps']} ({profile['consuming_moves']} consuming, "
+            f"{profile['epsilon_moves']} epsilon), halts: {profile['halts']}",
+            f"Peak stack depth: {profile['max_stack_depth']}",
+            "",
+            f"{'Stack depth':<16}{'Steps':>12}",
+        ]
+        for bucket, count in profile["stack_depth_histogram"].items():
+            lines.append(f"{bucket:<16}{count:>12}")
+
+        lines += ["", f"{'State':<16}{'Dir':<5}{'Steps':>12}{'Time (ms)':>12}"]
+        for state in profile["states"]:
+            lines.append(
+                f"{state['state']:<16}{state['direction']:<5}{state['steps']:>12}"
+                f"{state['time_ns'] / 1e6:>12.3f}"
+            )
+
+        def transition(rule):
+            return (
+                f"{rule['from']}, {_show(rule['input'])}, {_show(rule['stack'])} -> "
+                f"{rule['to']}, {_show(rule['stack_change'])}"
+            )
+
+        lines += ["", f"{'Transition':<40}{'Dir':<5}{'Count':>12}"]
+        for rule in profile["transitions"]:
+            lines.append(
+                f"{transition(rule):<40}{rule['direction']:<5}{rule['count']:>12}"
+            )
+        if profile["unused_transitions"]:
+            lines += ["", "Never fired:"]
+            for rule in profile["unused_transitions"]:
+                lines.append(f"  {transition(rule):<38}{rule['direction']}")
+        return "\n".join(lines)
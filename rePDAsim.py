@@ -1,20 +1,62 @@
 #! /usr/bin/env python3
 
+import argparse
 import sys
+from itertools import tee
 
-from pda import PDA
-from utils import parse_transitions
+import utils
+from batch import LOCKSTEP_CHUNKSIZE, read_inputs, simulate_many
+from cache import load_machine
+from nondeterministic import DEFAULT_MAX_CONFIGURATIONS, search
+from machine import Machine
+from pda import ENGINES, SimulationLimitError
+from profiling import PROFILE_FORMATS, Profiler
+from stacks import STACK_BACKENDS, top_symbols
+from tracing import TRACE_LEVELS, RingTracer, make_tracer
+from utils import read_chunks
 
+# Stack symbols shown by interactive and replay mode by default
+DEFAULT_STACK_VIEW = 16
 
-def usage(status=0):
-    print("Usage: python3 rePDAsim.py <machine.pda> [input string direction (f|b)]")
-    sys.exit(status)
+
+def parse_command(command):
+    """
+    Parse an interactive command into (input character, direction), or
+    return None if it is not one. An empty command is an epsilon step
+    forward and a lone direction an epsilon step in that direction.
+
+    >>> parse_command("0f"), parse_command("b"), parse_command(""), parse_command("0x")
+    (('0', 'f'), ('', 'b'), ('', 'f'), None)
+    """
+    if not command:
+        return "", "f"
+    if command in ("f", "b"):
+        return "", command
+    if len(command) == 2 and command[1] in ("f", "b"):
+        return command[0], command[1]
+    return None
+
+
+def format_stack(stack, limit):
+    """
+    Show the stack as a list, or only its top `limit` symbols and its depth
+    if it is deeper, so printing it does not cost time proportional to its depth.
+
+    >>> format_stack(["$", "(", "("], 4), format_stack(["$", "(", "("], 2)
+    ("['$', '(', '(']", "[..., '(', '('] (depth 3)")
+    """
+    depth = len(stack)
+    if depth <= limit:
+        return str(stack)
+    top = ", ".join(map(repr, top_symbols(stack, limit)))
+    return f"[..., {top}] (depth {depth})" if top else f"[...] (depth {depth})"
 
 
-def interactive_simulation(pda):
+def interactive_simulation(pda, stack_view=DEFAULT_STACK_VIEW):
     """
     Run the PDA in interactive mode.
     Allows users to input one character at a time with direction ('f' or 'b').
+    Only the top `stack_view` stack symbols are printed after each move.
     """
     print("Enter characters and direction {'f' or 'b'} (e.g., '0f', '1b').")
     print("Type 'exit' to quit.")
@@ -25,39 +67,23 @@ def interactive_simulation(pda):
             break
         if user_input == "exit":
             break
-        # no input
-        if len(user_input) == 0:
-            print("assuming no input character, forward")
-            direction = "f"
-            if pda.step("", direction):
-                print(
-                    f"State: {pda.current_state}, Stack: {pda.stack}{', input not consumed' if pda.last_consumed_char != '' else ''}"
-                )
-            else:
-                print("Invalid transition.")
-
-        # one character input means only direction
-        elif len(user_input) == 1 and user_input in ["f", "b"]:
-            print("assuming no input character")
-            direction = user_input
-            if pda.step("", direction):
-                print(
-                    f"State: {pda.current_state}, Stack: {pda.stack}{', input not consumed' if pda.last_consumed_char != '' else ''}"
-                )
-            else:
-                print("Invalid transition.")
-
-        # two characters input means input character and direction
-        elif len(user_input) == 2 and user_input[1] in ["f", "b"]:
-            char, direction = user_input
+        command = parse_command(user_input)
+        if command is None:
+            print("Invalid input. Format: <char><f|b> (e.g., '0f', '1b')")
+        else:
+            char, direction = command
+            # no input
+            if not user_input:
+                print("assuming no input character, forward")
+            # one character input means only direction
+            elif not char:
+                print("assuming no input character")
             if pda.step(char, direction):
                 print(
-                    f"State: {pda.current_state}, Stack: {pda.stack}{', input not consumed' if pda.last_consumed_char != char else ''}"
+                    f"State: {pda.current_state}, Stack: {format_stack(pda.stack, stack_view)}{', input not consumed' if pda.last_consumed_char != char else ''}"
                 )
             else:
                 print("Invalid transition.")
-        else:
-            print("Invalid input. Format: <char><f|b> (e.g., '0f', '1b')")
 
         if pda.current_state in pda.final_states:
             print("Accept state reached.")
@@ -67,50 +93,459 @@ def interactive_simulation(pda):
             break
 
 
-def main():
-    # Parse command-line arguments
-    if "-h" in sys.argv or "--help" in sys.argv:
-        usage(0)
-    elif not (len(sys.argv) == 2 or len(sys.argv) == 4):
-        usage(1)
-    elif len(sys.argv) == 3:
-        print("Input string specified but no direction.")
-        usage(1)
-
-    machine_file = sys.argv[1]
-
-    # Load transitions
-    with open(machine_file) as f:
-        transitions_str = f.read()
-    transitions = parse_transitions(transitions_str)
-    initial_state = "q0"
-    final_states = ["q_accept", "qacc"]
-    reject_states = ["q_reject", "qrej"]
-
-    # Initialize PDA
-    pda = PDA(transitions, initial_state, final_states, reject_states)
-
-    if pda.is_reversible():
-        print("The machine is reversible.")
-    # no else needed as the function will print the reason if it is not reversible
+def replay_simulation(pda, lines, stack_view=DEFAULT_STACK_VIEW):
+    """
+    Apply the interactive commands in `lines` without prompting or printing
+    each move, stopping at 'exit' or in an accept or reject state as
+    interactive mode does, then print a summary of the session.
+    """
+    commands = steps = invalid_transitions = invalid_commands = 0
+    first_invalid = None
+    final_states, reject_states = pda.final_states, pda.reject_states
+    step = pda.step
+    for line_number, line in enumerate(lines, 1):
+        line = line.strip()
+        if line == "exit":
+            break
+        command = parse_command(line)
+        if command is None:
+            invalid_commands += 1
+            if first_invalid is None:
+                first_invalid = line_number
+            continue
+        commands += 1
+        if step(*command):
+            steps += 1
+        else:
+            invalid_transitions += 1
+        state = pda.current_state
+        if state in final_states or state in reject_states:
+            break
+
+    print("Replay results:")
+    print(f"\tCommands: {commands}")
+    print(f"\tTransitions taken: {steps}")
+    print(f"\tInvalid transitions: {invalid_transitions}")
+    if invalid_commands:
+        print(f"\tInvalid commands: {invalid_commands} (first on line {first_invalid})")
+    print(f"\tFinal state: {pda.current_state}")
+    print(f"\tStack content: {format_stack(pda.stack, stack_view)}")
+    print(f"\tAccept state reached: {pda.current_state in final_states}")
+    print(f"\tReject state reached: {pda.current_state in reject_states}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        usage="python3 rePDAsim.py <machine.pda> [input string direction (f|b)]\n"
+        "       python3 rePDAsim.py <machine.pda> --batch <file|-> direction (f|b)\n"
+        "       python3 rePDAsim.py <machine.pda> --stream <file|-> direction (f|b)\n"
+        "       python3 rePDAsim.py <machine.pda> --replay <file|->",
+        description="Validate and simulate a reversible PDA.",
+    )
+    parser.add_argument("machine", help="the .pda transitions file")
+    parser.add_argument(
+        "args",
+        nargs="*",
+        metavar="input direction",
+        help="input string and direction (only the direction with --batch)",
+    )
+    parser.add_argument(
+        "--batch",
+        metavar="FILE",
+        help="simulate every line of FILE ('-' for stdin) as an input string",
+    )
+    parser.add_argument(
+        "--stream",
+        metavar="FILE",
+        help="simulate the whole contents of FILE ('-' for stdin) as one input "
+        "string, read incrementally",
+    )
+    parser.add_argument(
+        "--replay",
+        metavar="FILE",
+        help="apply the interactive commands in FILE ('-' for stdin), one per "
+        "line, without prompting, and print a summary",
+    )
+    parser.add_argument(
+        "--stack-view",
+        type=int,
+        default=DEFAULT_STACK_VIEW,
+        metavar="K",
+        help="stack symbols shown by interactive and --replay mode, from the "
+        f"top (default: {DEFAULT_STACK_VIEW})",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="worker processes for --batch (default: CPU count)",
+    )
+    parser.add_argument(
+        "--lockstep",
+        action="store_true",
+        help="simulate the --batch inputs in lockstep with NumPy, a chunk at a time",
+    )
+    parser.add_argument(
+        "--nondeterministic",
+        action="store_true",
+        help="search every applicable transition instead of taking the first "
+        "match, and print an accepting run if there is one",
+    )
+    parser.add_argument(
+        "--max-configurations",
+        type=int,
+        default=DEFAULT_MAX_CONFIGURATIONS,
+        metavar="N",
+        help="configurations stored by --nondeterministic before giving up "
+        f"(default: {DEFAULT_MAX_CONFIGURATIONS})",
+    )
+    parser.add_argument(
+        "--time-limit",
+        type=float,
+        metavar="SECONDS",
+        help="time allowed for --nondeterministic (default: unbounded)",
+    )
+    parser.add_argument(
+        "--max-steps",
+        type=int,
+        metavar="N",
+        help="abort a run after N steps (default: unbounded, or "
+        f"{utils.DEFAULT_MAX_STEPS} if the machine has epsilon cycles)",
+    )
+    parser.add_argument(
+        "--max-stack",
+        type=int,
+        metavar="N",
+        help="abort a run once the stack is deeper than N (default: unbounded, "
+        f"or {utils.DEFAULT_MAX_STACK} if the machine has epsilon cycles)",
+    )
+    parser.add_argument(
+        "--minimize",
+        action="store_true",
+        help="remove the transitions that can never fire before simulating",
+    )
+    parser.add_argument(
+        "--reject-early",
+        action="store_true",
+        help="stop a run as soon as it is in a state that cannot reach a final state",
+    )
+    parser.add_argument(
+        "--accept-early",
+        action="store_true",
+        help="stop a run and accept as soon as it is in a final state, "
+        "whatever the rest of the input",
+    )
+    parser.add_argument(
+        "--usage",
+        action="store_true",
+        help="add the input characters read and the steps taken to each "
+        "--batch result line",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="table",
+        help="how input strings are simulated: step through the compiled "
+        "table (default) or run Python generated for the machine (codegen)",
+    )
+    parser.add_argument(
+        "--stack",
+        choices=STACK_BACKENDS,
+        default="list",
+        help="stack representation: list (default), packed array of symbol "
+        "ids, or run-length encoded (rle) for deep counting machines",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="always parse and validate the machine instead of using the "
+        "compiled-machine cache",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        metavar="DIR",
+        help="compiled-machine cache directory (default: $REPDASIM_CACHE_DIR "
+        "or ~/.cache/rePDAsim)",
+    )
+    parser.add_argument(
+        "--trace",
+        choices=TRACE_LEVELS,
+        default="off",
+        help="per-step tracing: off (default), print every step, keep a ring "
+        "buffer of the last steps, or write a full JSONL trace",
+    )
+    parser.add_argument(
+        "--trace-size",
+        type=int,
+        default=32,
+        metavar="K",
+        help="number of steps kept by --trace ring (default: 32)",
+    )
+    parser.add_argument(
+        "--trace-file",
+        metavar="FILE",
+        help="destination of --trace jsonl (default: stdout)",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=PROFILE_FORMATS,
+        help="count the transitions fired, time spent per state and stack "
+        "depths, and print them after the run as a table or JSON",
+    )
+    parser.add_argument(
+        "--profile-file",
+        metavar="FILE",
+        help="destination of --profile (default: stdout)",
+    )
+    args = parser.parse_intermixed_args(argv)
 
+    if args.batch is not None and args.stream is not None:
+        parser.error("--batch and --stream cannot be combined.")
+    if args.batch is not None or args.stream is not None:
+        if len(args.args) != 1:
+            parser.error("--batch and --stream take exactly one direction.")
+        if args.batch is not None and (args.trace != "off" or args.profile):
+            parser.error("--trace and --profile are not supported with --batch.")
+        args.input_string, args.direction = None, args.args[0]
+    elif len(args.args) == 1:
+        parser.error("Input string specified but no direction.")
+    elif len(args.args) == 2:
+        args.input_string, args.direction = args.args
+    elif args.args:
+        parser.error("too many arguments")
+    else:
+        args.input_string = args.direction = None
+
+    if args.engine == "codegen" and (args.trace != "off" or args.stack != "list"):
+        parser.error("--engine codegen supports neither --trace nor --stack.")
+    if args.profile and args.trace != "off":
+        parser.error("--profile cannot be combined with --trace.")
+    if args.profile and (args.engine == "codegen" or args.nondeterministic):
+        parser.error(
+            "--profile supports neither --engine codegen nor --nondeterministic."
+        )
+    if args.lockstep:
+        if args.batch is None:
+            parser.error("--lockstep is only supported with --batch.")
+        if args.engine != "table" or args.stack != "list":
+            parser.error("--lockstep supports neither --engine nor --stack.")
+    if args.replay is not None:
+        if args.batch is not None or args.stream is not None or args.args:
+            parser.error(
+                "--replay cannot be combined with --batch, --stream or an input string."
+            )
+        if args.nondeterministic:
+            parser.error("--replay cannot be combined with --nondeterministic.")
+    if args.stack_view < 0:
+        parser.error("--stack-view cannot be negative.")
+    if args.usage and args.batch is None:
+        parser.error("--usage is only supported with --batch.")
+    if args.nondeterministic and args.input_string is None:
+        parser.error("--nondeterministic needs an input string and direction.")
+    if args.direction is not None and args.direction not in ("f", "b"):
+        parser.error(f"Invalid direction: {args.direction}")
+    if args.stream == "-" and args.direction == "b":
+        parser.error(
+            "Backward --stream reads the input back to front and needs a regular "
+            "file, not stdin."
+        )
+    return args
+
+
+def batch_simulation(args):
+    """
+    Simulate every input string in the --batch file and print one result line per input,
+    in input order: the input, final state, stack content and whether it was accepted,
+    then with --usage the input characters read and the steps taken.
+    """
+    f = sys.stdin if args.batch == "-" else open(args.batch)
+    try:
+        # tee only buffers the inputs that are still in flight in the pool
+        inputs, echo = tee(read_inputs(f))
+        results = simulate_many(
+            args.machine,
+            inputs,
+            args.direction,
+            workers=args.workers,
+            chunksize=LOCKSTEP_CHUNKSIZE if args.lockstep else 256,
+            use_cache=not args.no_cache,
+            cache_dir=args.cache_dir,
+            max_steps=args.max_steps,
+            max_stack=args.max_stack,
+            stack_backend=args.stack,
+            engine=args.engine,
+            reject_early=args.reject_early,
+            accept_early=args.accept_early,
+            minimize=args.minimize,
+            lockstep=args.lockstep,
+            usage=args.usage,
+        )
+        for input_string, res in zip(echo, results):
+            print(input_string, *res, sep="\t")
+    finally:
+        if f is not sys.stdin:
+            f.close()
+
+
+def print_results(res, pda=None):
+    print("Simulation results:")
+
+    print(f"\tFinal state: {res[0]}")
+    print(f"\tStack content: {res[1]}")
+    print(f"\tAccept state reached: {res[2]}")
+    if pda is not None:
+        print(f"\tInput characters read: {pda.position}")
+        print(f"\tSteps: {pda.steps}")
+
+
+def nondeterministic_simulation(args, pda, input_string, direction):
+    """
+    Search for an accepting run and print it as a witness.
+    """
+    result = search(
+        pda.transitions,
+        input_string,
+        direction,
+        pda.current_state,
+        pda.final_states,
+        max_configurations=args.max_configurations,
+        max_stack=args.max_stack,
+        time_limit=args.time_limit,
+    )
+    print(f"Configurations explored: {result.explored}")
+    if not result.accepted:
+        print("Simulation results:")
+        print("\tAccept state reached: False")
+        return
+
+    print("Witness path:")
+    for from_state, input_char, stack_char, to_state, stack_change in result.path:
+        print(
+            f"\t{from_state},{input_char or 'ep'},{stack_char or 'ep'},"
+            f"{to_state},{stack_change or 'ep'}"
+        )
+    print_results((result.state, result.stack, result.accepted))
+
+
+def run(args, pda):
     # Simulate or check reversibility
-    if len(sys.argv) == 2:
-        interactive_simulation(pda)
-    if len(sys.argv) == 4:
-        input_string = sys.argv[2]
-        direction = sys.argv[3]
+    if args.batch is not None:
+        batch_simulation(args)
+    elif args.stream is not None:
+        # The input is read back to front for backward runs
+        reverse = args.direction == "b"
+        try:
+            if args.stream == "-":
+                chunks = read_chunks(sys.stdin, reverse=reverse)
+                res = pda.simulate_stream(chunks, args.direction)
+            else:
+                with open(args.stream) as f:
+                    chunks = read_chunks(f, reverse=reverse)
+                    res = pda.simulate_stream(chunks, args.direction)
+        except ValueError as e:
+            # Unreadable input, e.g. a pipe read backward or invalid UTF-8
+            print(f"Cannot read {args.stream}: {e}")
+            sys.exit(1)
+        print_results(res, pda)
+    elif args.replay is not None:
+        if args.replay == "-":
+            replay_simulation(pda, sys.stdin, args.stack_view)
+        else:
+            with open(args.replay) as f:
+                replay_simulation(pda, f, args.stack_view)
+    elif args.input_string is None:
+        interactive_simulation(pda, args.stack_view)
+    else:
+        input_string = args.input_string
+        direction = args.direction
         if direction == "b":
             input_string = input_string[::-1]
-            pda.current_state = "qacc"
-            pda.final_states = set(["q0"])
 
-        res = pda.simulate(input_string, direction)
-        print("Simulation results:")
+        if args.nondeterministic:
+            nondeterministic_simulation(args, pda, input_string, direction)
+        else:
+            res = pda.simulate(input_string, direction)
+            print_results(res, pda)
+
+
+def print_profile(args, profiler, pda):
+    profiler.stop(pda.stack)
+    report = profiler.to_json() if args.profile == "json" else profiler.format_table()
+    if args.profile_file is None:
+        print(report)
+    else:
+        with open(args.profile_file, "w") as f:
+            print(report, file=f)
+
+
+def main():
+    # Parse command-line arguments
+    args = parse_args()
+
+    # Load transitions, compiled and validated, from the cache when possible
+    compiled = load_machine(
+        args.machine, cache_dir=args.cache_dir, use_cache=not args.no_cache
+    )
+    machine = Machine(
+        compiled.transitions,
+        utils.INITIAL_STATE,
+        utils.FINAL_STATES,
+        utils.REJECT_STATES,
+        table=compiled.table,
+    )
+    if args.minimize:
+        machine, removed = machine.minimized()
+        print(f"Removed {removed} transitions that can never fire.")
+    # Backward runs start from the accept state and end at the initial state
+    machine = machine.for_direction(args.direction)
+
+    trace_file = sys.stdout
+    if args.trace == "jsonl" and args.trace_file is not None:
+        trace_file = open(args.trace_file, "w")
+    tracer = make_tracer(args.trace, size=args.trace_size, f=trace_file)
+    if args.profile:
+        tracer = Profiler(machine.transitions)
+
+    # Start a run of the machine
+    pda = machine.run(
+        tracer=tracer,
+        stack_backend=args.stack,
+        engine=args.engine,
+        reject_early=args.reject_early,
+        accept_early=args.accept_early,
+    )
+
+    # Machines that can loop on epsilon moves get a budget unless one was given
+    for direction, cycles in pda.table.epsilon_cycles.items():
+        for cycle in cycles:
+            print(
+                f"Warning: epsilon cycle in direction '{direction}': {' -> '.join(cycle)}"
+            )
+    args.max_steps, args.max_stack = machine.default_budgets(
+        args.max_steps, args.max_stack
+    )
+    pda.max_steps = args.max_steps
+    pda.max_stack = args.max_stack
+
+    report = compiled.report
+    if report:
+        print("The machine is reversible.")
+    else:
+        print(report)
 
-        print(f"\tFinal state: {res[0]}")
-        print(f"\tStack content: {res[1]}")
-        print(f"\tAccept state reached: {res[2]}")
+    try:
+        run(args, pda)
+    except SimulationLimitError as e:
+        print(f"Simulation aborted: {e}")
+        sys.exit(1)
+    finally:
+        if isinstance(tracer, RingTracer):
+            print(f"Last {len(tracer.steps)} steps:")
+            tracer.dump()
+        if isinstance(tracer, Profiler):
+            print_profile(args, tracer, pda)
+        if trace_file is not sys.stdout:
+            trace_file.close()
 
 
 if __name__ == "__main__":
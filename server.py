@@ -0,0 +1,393 @@
+#! /usr/bin/env python3
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from batch import machine_runs, simulate_inputs
+from cache import cache_key, load_machine
+from machine import Machine
+from pda import ENGINES, SimulationLimitError
+from stacks import STACK_BACKENDS
+
+# Lines longer than this are refused, so one client cannot exhaust memory
+MAX_REQUEST_SIZE = 64 << 20
+
+
+class MachinePool:
+    """
+    Loaded, validated machines with their runs, keyed by the hash of the file
+    contents (see `cache.cache_key`).
+
+    A path is looked up by its hash once and then again only when its size or
+    modification time changes, so editing a machine file between requests
+    picks up the new machine. Several paths with the same contents share one
+    entry, and a machine can also be selected by its hash once it is loaded.
+
+    >>> machine = os.path.join(os.path.dirname(__file__), "examples", "counting.pda")
+    >>> pool = MachinePool(use_cache=False)
+    >>> key = pool.load(machine)
+    >>> pool.simulate(key, ["(())", "(()"], "f")
+    [('qacc', [], True), ('q1', ['$', '('], False)]
+    >>> bool(pool.machines[key].report)
+    True
+    """
+
+    def __init__(self, use_cache=True, cache_dir=None, **pda_options):
+        self.cache_options = {"use_cache": use_cache, "cache_dir": cache_dir}
+        self.pda_options = pda_options
+        # hash -> CompiledMachine and hash -> {direction: Run}
+        self.machines = {}
+        self.runs = {}
+        # path -> ((size, mtime), hash)
+        self.paths = {}
+
+    def load(self, machine_file) -> str:
+        """
+        Make sure the machine in `machine_file` is loaded and return its hash.
+        The machine the path held before is dropped unless another path still has it.
+
+        >>> import shutil, tempfile
+        >>> machine_file = os.path.join(tempfile.mkdtemp(), "m.pda")
+        >>> _ = shutil.copy(os.path.join(os.path.dirname(__file__), "examples", "counting.pda"), machine_file)
+        >>> pool = MachinePool(use_cache=False)
+        >>> first = pool.load(machine_file)
+        >>> with open(machine_file, "a") as f:
+        ...     _ = f.write("f,q9,ep,ep,q9,ep\\n")
+        >>> pool.load(machine_file) != first, list(pool.machines) == [pool.load(machine_file)]
+        (True, True)
+        """
+        stat = os.stat(machine_file)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        known = self.paths.get(machine_file)
+        if known is not None and known[0] == signature:
+            return known[1]
+
+        key = cache_key(machine_file)
+        if key not in self.machines:
+            compiled = load_machine(machine_file, **self.cache_options)
+            machine = Machine(compiled.transitions, table=compiled.table)
+            options = dict(self.pda_options)
+            options["max_steps"], options["max_stack"] = machine.default_budgets(
+                options.get("max_steps"), options.get("max_stack")
+            )
+            self.machines[key] = compiled
+            self.runs[key] = machine_runs(machine, options)
+        self.paths[machine_file] = (signature, key)
+        if known is not None and known[1] != key:
+            self._forget(known[1])
+        return key
+
+    def _forget(self, key):
+        if all(other != key for _, other in self.paths.values()):
+            del self.machines[key]
+            del self.runs[key]
+
+    def simulate(self, key, input_strings, direction, lockstep=False, usage=False):
+        """
+        Simulate input strings on a loaded machine, see `batch.simulate_many`.
+        """
+        return simulate_inputs(
+            self.runs[key], input_strings, direction, lockstep, usage
+        )
+
+
+# The pool of each executor process, created by _init_worker
+_worker_pool = None
+
+
+def _init_worker(pool_options, preload=()):
+    global _worker_pool
+    _worker_pool = MachinePool(**pool_options)
+    for machine_file in preload:
+        try:
+            _worker_pool.load(machine_file)
+        except Exception:
+            # Reported when Server.serve loads it; the worker must still start
+            pass
+
+
+def _load_request(machine_file):
+    key = _worker_pool.load(machine_file)
+    return key, _worker_pool.machines[key].report.to_dict()
+
+
+def _simulate_request(
+    machine_file, expected_key, input_strings, direction, lockstep, usage
+):
+    # A machine selected by hash is not simulated if its file has changed since
+    key = _worker_pool.load(machine_file)
+    if expected_key is not None and key != expected_key:
+        return key, None
+    return key, _worker_pool.simulate(key, input_strings, direction, lockstep, usage)
+
+
+class Server:
+    """
+    Line-delimited JSON simulation server.
+
+    Every request is one JSON object on its own line and gets one JSON object
+    back on its own line; any "id" in the request is echoed in the reply.
+    Requests on one connection are answered in order.
+
+        {"op": "load", "machine": PATH}
+            -> {"hash": HASH, "valid": BOOL, "violations": [...]}
+        {"op": "simulate", "machine": PATH or "hash": HASH,
+         "direction": "f" | "b", "input": STRING or "inputs": [STRING, ...]}
+            -> {"result": [FINAL_STATE, STACK, ACCEPTED]} or {"results": [...]}
+
+    "op" defaults to "simulate", "lockstep": true simulates a list of
+    inputs with `lockstep.simulate_lockstep`, and "usage": true adds the
+    input characters read and the steps taken to each result. Errors are reported as
+    {"error": MESSAGE} and leave the connection open.
+
+    Machines are loaded and simulated in a pool of worker processes that each
+    keep a `MachinePool`, so a slow simulation never blocks the event loop and
+    repeated requests skip parsing, validation and compilation.
+    """
+
+    def __init__(self, workers=None, use_cache=True, cache_dir=None, **pda_options):
+        self.pool_options = {
+            "use_cache": use_cache,
+            "cache_dir": cache_dir,
+            **pda_options,
+        }
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = None
+        # Machine files every worker loads when it starts, see `serve`
+        self.preload = ()
+        # hash -> path of a machine file with those contents, and path -> hash
+        self.hashes = {}
+        self.path_hashes = {}
+
+    def start_executor(self):
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self.pool_options, self.preload),
+        )
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    async def _run(self, function, *args):
+        loop = asyncio.get_running_loop()
+        executor = self.executor
+        try:
+            return await loop.run_in_executor(executor, function, *args)
+        except BrokenProcessPool:
+            # A worker died, e.g. killed for using too much memory; later
+            # requests get a fresh pool
+            if self.executor is executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+                self.start_executor()
+            raise
+
+    def _remember(self, key, machine_file):
+        # A path only selects its latest contents by hash
+        previous = self.path_hashes.get(machine_file)
+        if previous != key and self.hashes.get(previous) == machine_file:
+            del self.hashes[previous]
+        self.path_hashes[machine_file] = key
+        self.hashes[key] = machine_file
+
+    async def load(self, machine_file):
+        key, report = await self._run(_load_request, machine_file)
+        self._remember(key, machine_file)
+        return {"hash": key, **report}
+
+    async def handle_request(self, request):
+        if not isinstance(request, dict):
+            raise ValueError("A request must be a JSON object.")
+        op = request.get("op", "simulate")
+        if op == "load":
+            return await self.load(_machine_path(request))
+        if op != "simulate":
+            raise ValueError(f"Unknown op: {op}")
+
+        expected_key = None
+        if "machine" in request:
+            machine_file = _machine_path(request)
+        elif isinstance(request.get("hash"), str) and request["hash"] in self.hashes:
+            expected_key = request["hash"]
+            machine_file = self.hashes[expected_key]
+        else:
+            raise ValueError("Unknown machine hash; load the machine first.")
+
+        direction = request.get("direction")
+        if direction not in ("f", "b"):
+            raise ValueError(f"Invalid direction: {direction}")
+
+        single = "inputs" not in request
+        inputs = [request.get("input")] if single else request["inputs"]
+        if not isinstance(inputs, list) or not all(
+            isinstance(input_string, str) for input_string in inputs
+        ):
+            raise ValueError("Inputs must be strings.")
+
+        key, results = await self._run(
+            _simulate_request,
+            machine_file,
+            expected_key,
+            inputs,
+            direction,
+            bool(request.get("lockstep")),
+            bool(request.get("usage")),
+        )
+        self._remember(key, machine_file)
+        if results is None:
+            raise ValueError(
+                f"The machine with hash {expected_key} has changed on disk; "
+                "load it again."
+            )
+        results = [list(result) for result in results]
+        return {"result": results[0]} if single else {"results": results}
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while line := await reader.readline():
+                if not line.strip():
+                    continue
+                request = None
+                try:
+                    request = json.loads(line)
+                    reply = await self.handle_request(request)
+                except (ValueError, OSError, SimulationLimitError) as e:
+                    reply = {"error": str(e)}
+                except Exception as e:
+                    reply = {"error": f"{type(e).__name__}: {e}"}
+                if isinstance(request, dict) and "id" in request:
+                    reply = {"id": request["id"], **reply}
+                writer.write(json.dumps(reply).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            # The client went away, or sent a line longer than MAX_REQUEST_SIZE
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, unix=None, host=None, port=None, preload=()):
+        """
+        Accept connections on a Unix socket path or a TCP host and port until cancelled.
+        Every worker loads the `preload` machine files as it starts.
+        """
+        self.preload = tuple(os.path.abspath(machine_file) for machine_file in preload)
+        self.start_executor()
+        try:
+            for machine_file in self.preload:
+                await self.load(machine_file)
+            if unix is not None:
+                server = await asyncio.start_unix_server(
+                    self.handle_connection, unix, limit=MAX_REQUEST_SIZE
+                )
+            else:
+                server = await asyncio.start_server(
+                    self.handle_connection, host, port, limit=MAX_REQUEST_SIZE
+                )
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.close()
+
+
+def _machine_path(request):
+    machine_file = request.get("machine")
+    if not isinstance(machine_file, str):
+        raise ValueError("The machine must be a path.")
+    return os.path.abspath(machine_file)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        usage="python3 server.py (--unix PATH | --tcp HOST:PORT) [machine.pda ...]",
+        description="Serve simulations of reversible PDAs over a socket, "
+        "one JSON request and reply per line.",
+    )
+    parser.add_argument(
+        "machines", nargs="*", help="machine files to load before serving"
+    )
+    address = parser.add_mutually_exclusive_group(required=True)
+    address.add_argument("--unix", metavar="PATH", help="listen on a Unix socket")
+    address.add_argument("--tcp", metavar="HOST:PORT", help="listen on a TCP port")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="worker processes (default: CPU count)",
+    )
+    parser.add_argument(
+        "--max-steps",
+        type=int,
+        metavar="N",
+        help="abort a run after N steps (default: as in rePDAsim.py)",
+    )
+    parser.add_argument(
+        "--max-stack",
+        type=int,
+        metavar="N",
+        help="abort a run once the stack is deeper than N (default: as in rePDAsim.py)",
+    )
+    parser.add_argument(
+        "--reject-early",
+        action="store_true",
+        help="stop a run as soon as it is in a state that cannot reach a final state",
+    )
+    parser.add_argument(
+        "--accept-early",
+        action="store_true",
+        help="stop a run and accept as soon as it is in a final state",
+    )
+    parser.add_argument("--engine", choices=ENGINES, default="table")
+    parser.add_argument("--stack", choices=STACK_BACKENDS, default="list")
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="always parse machine files instead of using the compiled-machine cache",
+    )
+    parser.add_argument("--cache-dir", metavar="DIR", help="compiled-machine cache")
+    args = parser.parse_intermixed_args(argv)
+
+    if args.engine == "codegen" and args.stack != "list":
+        parser.error("--engine codegen does not support --stack.")
+    if args.tcp is not None:
+        host, _, port = args.tcp.rpartition(":")
+        if not port.isdigit():
+            parser.error("--tcp takes HOST:PORT.")
+        args.host, args.port = host or None, int(port)
+    return args
+
+
+def main():
+    args = parse_args()
+    server = Server(
+        workers=args.workers,
+        use_cache=not args.no_cache,
+        cache_dir=args.cache_dir,
+        max_steps=args.max_steps,
+        max_stack=args.max_stack,
+        stack_backend=args.stack,
+        engine=args.engine,
+        reject_early=args.reject_early,
+        accept_early=args.accept_early,
+    )
+    if args.unix is not None:
+        address = {"unix": args.unix}
+    else:
+        address = {"host": args.host, "port": args.port}
+    try:
+        asyncio.run(server.serve(preload=args.machines, **address))
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        print(f"Cannot serve: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
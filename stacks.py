@@ -0,0 +1,321 @@
+from array import array
+
+# Stack backends accepted by PDA
+STACK_BACKENDS = ["list", "array", "rle", "linked"]
+
+
+class ArrayStack:
+    """
+    Stack of interned stack symbol ids (see `table.TransitionTable`) packed into an array.
+    One byte per symbol for machines with up to 256 stack symbols.
+    Iterating, indexing and printing show the symbols themselves, like the list stack.
+
+    >>> stack = ArrayStack(["", "$", "("])
+    >>> stack.push(1)
+    >>> stack.push(2)
+    >>> stack.peek(), len(stack)
+    (2, 2)
+    >>> stack
+    ['$', '(']
+    >>> stack.pop()
+    2
+    >>> stack.to_list()
+    ['$']
+    """
+
+    __slots__ = ("symbols", "ids")
+
+    def __init__(self, symbols):
+        self.symbols = symbols
+        self.ids = array("B" if len(symbols) <= 256 else "I")
+
+    def push(self, symbol_id, count=1):
+        if count == 1:
+            self.ids.append(symbol_id)
+        else:
+            self.ids.extend(array(self.ids.typecode, (symbol_id,)) * count)
+
+    def pop(self, count=1):
+        """
+        Pop `count` symbols at once and return the id of the last one popped.
+        """
+        if count == 1:
+            return self.ids.pop()
+        symbol_id = self.ids[-count]
+        del self.ids[-count:]
+        return symbol_id
+
+    def peek(self):
+        """
+        Return the id of the top symbol, or 0 if the stack is empty.
+        """
+        return self.ids[-1] if self.ids else 0
+
+    def snapshot(self):
+        """
+        Return an independent copy of the stack contents for `restore`.
+        """
+        return self.ids[:]
+
+    def restore(self, snapshot):
+        self.ids = snapshot[:]
+
+    def top(self, count):
+        """
+        Return the top `count` symbols, bottom first, in O(count).
+        """
+        symbols = self.symbols
+        return [symbols[symbol_id] for symbol_id in self.ids[-count:]] if count else []
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __iter__(self):
+        symbols = self.symbols
+        return (symbols[symbol_id] for symbol_id in self.ids)
+
+    def __getitem__(self, index):
+        return self.symbols[self.ids[index]]
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return repr(self.to_list())
+
+    def to_list(self):
+        return list(self)
+
+
+class RunLengthStack:
+    """
+    Run-length encoded stack of interned stack symbol ids.
+    A run of the same symbol costs O(1) memory however long it is, so counting
+    machines that push millions of copies of one symbol stay small.
+
+    >>> stack = RunLengthStack(["", "$", "("])
+    >>> stack.push(1)
+    >>> for _ in range(100000):
+    ...     stack.push(2)
+    >>> len(stack), len(stack.runs)
+    (100001, 2)
+    >>> stack.pop()
+    2
+    >>> stack[-1], stack.counts[-1]
+    ('(', 99999)
+    """
+
+    __slots__ = ("symbols", "runs", "counts", "size")
+
+    def __init__(self, symbols):
+        self.symbols = symbols
+        self.runs = array("B" if len(symbols) <= 256 else "I")
+        self.counts = array("Q")
+        self.size = 0
+
+    def push(self, symbol_id, count=1):
+        """
+        Push `count` copies of a symbol at once.
+        """
+        if self.runs and self.runs[-1] == symbol_id:
+            self.counts[-1] += count
+        else:
+            self.runs.append(symbol_id)
+            self.counts.append(count)
+        self.size += count
+
+    def pop(self, count=1):
+        """
+        Pop `count` copies of the top symbol at once and return its id.
+        The caller must make sure the top run is at least `count` long.
+        """
+        symbol_id = self.runs[-1]
+        if self.counts[-1] == count:
+            self.runs.pop()
+            self.counts.pop()
+        else:
+            self.counts[-1] -= count
+        self.size -= count
+        return symbol_id
+
+    def peek(self):
+        """
+        Return the id of the top symbol, or 0 if the stack is empty.
+        """
+        return self.runs[-1] if self.runs else 0
+
+    def snapshot(self):
+        """
+        Return an independent copy of the stack contents for `restore`, O(runs).
+        """
+        return self.runs[:], self.counts[:], self.size
+
+    def restore(self, snapshot):
+        runs, counts, self.size = snapshot
+        self.runs = runs[:]
+        self.counts = counts[:]
+
+    def top(self, count):
+        """
+        Return the top `count` symbols, bottom first, in O(count) however long the runs are.
+
+        >>> stack = RunLengthStack(["", "$", "("])
+        >>> stack.push(1)
+        >>> stack.push(2, 1000000)
+        >>> stack.top(3), stack.top(0)
+        (['(', '(', '('], [])
+        """
+        top = []
+        index = len(self.runs) - 1
+        while count > 0 and index >= 0:
+            taken = min(count, self.counts[index])
+            top[:0] = [self.symbols[self.runs[index]]] * taken
+            count -= taken
+            index -= 1
+        return top
+
+    def __len__(self):
+        return self.size
+
+    def __iter__(self):
+        symbols = self.symbols
+        for symbol_id, count in zip(self.runs, self.counts):
+            symbol = symbols[symbol_id]
+            for _ in range(count):
+                yield symbol
+
+    def __getitem__(self, index):
+        if index == -1:
+            return self.symbols[self.runs[-1]]
+        return self.to_list()[index]
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return repr(self.to_list())
+
+    def to_list(self):
+        return list(self)
+
+
+class LinkedStack:
+    """
+    Persistent stack of interned stack symbol ids, stored as immutable
+    (symbol id, rest, size) nodes. Pushing never modifies existing nodes, so
+    a snapshot is just the current top node: O(1), and every snapshot shares
+    the structure below it with the live stack.
+
+    >>> stack = LinkedStack(["", "$", "("])
+    >>> stack.push(1)
+    >>> saved = stack.snapshot()
+    >>> stack.push(2)
+    >>> stack.push(2)
+    >>> stack
+    ['$', '(', '(']
+    >>> stack.restore(saved)
+    >>> stack, len(stack)
+    (['$'], 1)
+    """
+
+    __slots__ = ("symbols", "head")
+
+    def __init__(self, symbols):
+        self.symbols = symbols
+        self.head = None
+
+    def push(self, symbol_id, count=1):
+        head = self.head
+        size = head[2] if head else 0
+        for size in range(size + 1, size + count + 1):
+            head = (symbol_id, head, size)
+        self.head = head
+
+    def pop(self, count=1):
+        """
+        Pop `count` symbols at once and return the id of the last one popped.
+        """
+        head = self.head
+        for _ in range(count):
+            symbol_id, head = head[0], head[1]
+        self.head = head
+        return symbol_id
+
+    def peek(self):
+        """
+        Return the id of the top symbol, or 0 if the stack is empty.
+        """
+        return self.head[0] if self.head else 0
+
+    def snapshot(self):
+        return self.head
+
+    def restore(self, snapshot):
+        self.head = snapshot
+
+    def top(self, count):
+        """
+        Return the top `count` symbols, bottom first, in O(count).
+        """
+        ids = []
+        node = self.head
+        while node and len(ids) < count:
+            ids.append(node[0])
+            node = node[1]
+        symbols = self.symbols
+        return [symbols[symbol_id] for symbol_id in reversed(ids)]
+
+    def __len__(self):
+        return self.head[2] if self.head else 0
+
+    def __iter__(self):
+        ids = []
+        node = self.head
+        while node:
+            ids.append(node[0])
+            node = node[1]
+        symbols = self.symbols
+        return (symbols[symbol_id] for symbol_id in reversed(ids))
+
+    def __getitem__(self, index):
+        if index == -1:
+            return self.symbols[self.head[0]]
+        return self.to_list()[index]
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return repr(self.to_list())
+
+    def to_list(self):
+        return list(self)
+
+
+def top_symbols(stack, count):
+    """
+    Return the top `count` symbols of a stack of any backend, bottom first,
+    without copying the rest of it.
+
+    >>> top_symbols(["$", "(", "["], 2), top_symbols(["$"], 0)
+    (['(', '['], [])
+    """
+    if isinstance(stack, list):
+        return stack[-count:] if count else []
+    return stack.top(count)
+
+
+def make_stack(backend, symbols):
+    """
+    Create an empty stack for a backend name, using `symbols` to show the
+    interned ids. The "list" backend is a plain list of symbols.
+    """
+    if backend == "list":
+        return []
+    if backend == "array":
+        return ArrayStack(symbols)
+    if backend == "rle":
+        return RunLengthStack(symbols)
+    if backend == "linked":
+        return LinkedStack(symbols)
+    raise ValueError(f"Invalid stack backend: {backend}")
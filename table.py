@@ -0,0 +1,244 @@
+class TransitionTable:
+    """
+    Dense, integer-indexed form of the nested dictionary returned by
+    `utils.parse_transitions`.
+
+    States, input symbols and stack symbols are interned to ints. Id 0 of the
+    input and stack alphabets is reserved for epsilon (no input character,
+    empty or unmatched stack top). Each direction gets one flat list of cells
+    indexed by (state, input, stack-top); every cell already holds the
+    transition `PDA.step` would pick for that configuration, so the
+    dict-order and epsilon fallback rules are resolved once at compile time.
+
+    `epsilon[direction][state]` tells whether a state has any epsilon-input
+    rule, and `epsilon_cycles[direction]` lists the cycles of states connected
+    only by epsilon-input rules, which can loop forever without consuming
+    input. `self_loops[direction]` holds the indices of the
+    cells that stay in their state, consume the character and purely push the
+    symbol already on top or purely pop it, so the same cell applies again to
+    the next identical character and a whole run of them can be applied at once.
+
+    A cell is either None or a tuple (to_state, pop, push, consumes):
+        to_state (int): id of the next state
+        pop (int): stack symbol id to pop, 0 for no pop
+        push (tuple[int, ...]): stack symbol ids to push, in push order
+        consumes (bool): whether the transition consumes the input character
+
+    >>> table = TransitionTable({
+    ...     "f": {
+    ...         "q0": {("", ""): ("q1", "$")},
+    ...         "q1": {("(", ""): ("q1", "("), (")", "("): ("q1", ""), ("", "$"): ("qacc", "")},
+    ...     },
+    ...     "b": {},
+    ... })
+    >>> table.states
+    ['q0', 'q1', 'qacc']
+    >>> table.input_symbols
+    ['', '(', ')']
+    >>> table.stack_symbols
+    ['', '$', '(']
+    >>> q1 = table.state_ids["q1"]
+    >>> table.lookup("f", q1, table.input_ids["("], table.stack_ids["$"])
+    (1, 0, (2,), True)
+    >>> table.lookup("f", q1, table.input_ids[")"], table.stack_ids["$"])
+    (2, 1, (), False)
+    >>> table.lookup("f", q1, table.input_ids[")"], 0) is None
+    True
+    >>> table.epsilon_cycles["f"]
+    []
+    >>> [table.cells["f"][index] for index in sorted(table.self_loops["f"])]
+    [(1, 0, (2,), True), (1, 2, (), True)]
+    """
+
+    __slots__ = (
+        "states",
+        "state_ids",
+        "input_symbols",
+        "input_ids",
+        "stack_symbols",
+        "stack_ids",
+        "cells",
+        "epsilon",
+        "epsilon_cycles",
+        "self_loops",
+    )
+
+    def __init__(self, transitions: dict):
+        self.states: list[str] = []
+        self.state_ids: dict[str, int] = {}
+        self.input_symbols: list[str] = [""]
+        self.input_ids: dict[str, int] = {"": 0}
+        self.stack_symbols: list[str] = [""]
+        self.stack_ids: dict[str, int] = {"": 0}
+
+        # Intern every symbol first so the table dimensions are known
+        for dir_transitions in transitions.values():
+            for from_state, transitions_for_state in dir_transitions.items():
+                self._intern_state(from_state)
+                for (input_char, stack_char), (
+                    to_state,
+                    stack_change,
+                ) in transitions_for_state.items():
+                    self._intern_state(to_state)
+                    _intern(input_char, self.input_symbols, self.input_ids)
+                    _intern(stack_char, self.stack_symbols, self.stack_ids)
+                    for symbol in stack_change:
+                        _intern(symbol, self.stack_symbols, self.stack_ids)
+
+        self.cells: dict[str, list] = {}
+        self.epsilon: dict[str, list[bool]] = {}
+        self.epsilon_cycles: dict[str, list[list[str]]] = {}
+        self.self_loops: dict[str, frozenset[int]] = {}
+        for direction, dir_transitions in transitions.items():
+            self.cells[direction], self.epsilon[direction] = self._compile(
+                dir_transitions
+            )
+            self.epsilon_cycles[direction] = find_epsilon_cycles(dir_transitions)
+            self.self_loops[direction] = self._self_loops(self.cells[direction])
+
+    def _intern_state(self, state):
+        if state not in self.state_ids:
+            self.state_ids[state] = len(self.states)
+            self.states.append(state)
+
+    def _compile(self, dir_transitions):
+        """
+        Build the flat cell list and per-state epsilon flags for one direction.
+        """
+        n_inputs = len(self.input_symbols)
+        n_stack = len(self.stack_symbols)
+        cells = [None] * (len(self.states) * n_inputs * n_stack)
+        epsilon = [False] * len(self.states)
+
+        for from_state, transitions_for_state in dir_transitions.items():
+            state_id = self.state_ids[from_state]
+            base = state_id * n_inputs * n_stack
+            # Walk the rules in reverse dict order so that earlier rules
+            # overwrite later ones, matching the first-match scan of PDA.step
+            for (input_char, stack_char), (to_state, stack_change) in reversed(
+                list(transitions_for_state.items())
+            ):
+                input_id = self.input_ids[input_char]
+                stack_id = self.stack_ids[stack_char]
+                cell = (
+                    self.state_ids[to_state],
+                    stack_id,
+                    tuple(self.stack_ids[symbol] for symbol in reversed(stack_change)),
+                    input_id != 0,
+                )
+                if input_id == 0:
+                    epsilon[state_id] = True
+
+                # An epsilon input matches every input character and an
+                # epsilon stack char matches every stack top
+                input_range = range(n_inputs) if input_id == 0 else (input_id,)
+                stack_range = range(n_stack) if stack_id == 0 else (stack_id,)
+                for i in input_range:
+                    row = base + i * n_stack
+                    for s in stack_range:
+                        cells[row + s] = cell
+
+        return cells, epsilon
+
+    def _self_loops(self, cells):
+        n_stack = len(self.stack_symbols)
+        cells_per_state = len(self.input_symbols) * n_stack
+        loops = set()
+        for index, cell in enumerate(cells):
+            if cell is None or not cell[3]:
+                continue
+            to_state, pop, push, _ = cell
+            top_id = index % n_stack
+            if to_state != index // cells_per_state or not top_id:
+                continue
+            if (pop and not push) or (not pop and push == (top_id,)):
+                loops.add(index)
+        return frozenset(loops)
+
+    def lookup(self, direction, state_id, input_id, top_id):
+        """
+        Return the cell for a configuration, or None if no transition applies.
+        """
+        n_stack = len(self.stack_symbols)
+        return self.cells[direction][
+            (state_id * len(self.input_symbols) + input_id) * n_stack + top_id
+        ]
+
+
+def _intern(symbol, symbols, ids):
+    if symbol not in ids:
+        ids[symbol] = len(symbols)
+        symbols.append(symbol)
+
+
+def find_epsilon_cycles(dir_transitions: dict) -> list[list[str]]:
+    """
+    Find the cycles of states joined by epsilon-input rules in one direction.
+
+    Each cycle is a strongly connected component of the epsilon graph (or a
+    state with an epsilon self-loop), listed as its states in order of first
+    appearance. Whether a cycle actually loops at runtime depends on the stack,
+    so these are candidates for a runaway simulation, not a proof of one.
+
+    >>> find_epsilon_cycles({
+    ...     "q0": {("", ""): ("q1", "$")},
+    ...     "q1": {("", ""): ("q1", "X"), ("a", ""): ("q2", "")},
+    ...     "q2": {("", "X"): ("q3", "")},
+    ...     "q3": {("", ""): ("q2", "")},
+    ... })
+    [['q1'], ['q2', 'q3']]
+    """
+    graph: dict[str, list[str]] = {}
+    for from_state, transitions_for_state in dir_transitions.items():
+        for (input_char, _), (to_state, _) in transitions_for_state.items():
+            if input_char == "":
+                graph.setdefault(from_state, []).append(to_state)
+
+    # Iterative Tarjan's algorithm, so deep graphs do not hit the recursion limit
+    order = {}
+    low = {}
+    on_stack = set()
+    stack = []
+    components = []
+    for root in graph:
+        if root in order:
+            continue
+        work = [(root, iter(graph.get(root, ())))]
+        order[root] = low[root] = len(order)
+        stack.append(root)
+        on_stack.add(root)
+        while work:
+            state, successors = work[-1]
+            for successor in successors:
+                if successor not in order:
+                    order[successor] = low[successor] = len(order)
+                    stack.append(successor)
+                    on_stack.add(successor)
+                    work.append((successor, iter(graph.get(successor, ()))))
+                    break
+                if successor in on_stack:
+                    low[state] = min(low[state], order[successor])
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    low[parent] = min(low[parent], low[state])
+                if low[state] == order[state]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == state:
+                            break
+                    if len(component) > 1 or state in graph.get(state, ()):
+                        components.append(sorted(component, key=order.get))
+
+    return sorted(components, key=lambda component: order[component[0]])
+
+
+def compile_transitions(transitions: dict) -> TransitionTable:
+    """
+    Compile the output of `utils.parse_transitions` into a `TransitionTable`.
+    """
+    return TransitionTable(transitions)
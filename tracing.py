@@ -0,0 +1,99 @@
+import json
+from collections import deque
+
+# Trace levels accepted by the command line tools
+TRACE_LEVELS = ["off", "print", "ring", "jsonl"]
+
+
+class PrintTracer:
+    """
+    Print every step the way `PDA.step` always used to.
+    Formatting the stack is O(depth), so this is meant for short runs only.
+
+    >>> tracer = PrintTracer()
+    >>> tracer("q1", "(", "f", ["$"])
+    current_state: q1, char: (, direction: f, stack: ['$']
+    """
+
+    def __call__(self, state, char, direction, stack):
+        print(
+            f"current_state: {state}, char: {char}, direction: {direction}, stack: {stack}"
+        )
+
+
+class RingTracer:
+    """
+    Keep the last `size` steps in memory for post-mortem debugging.
+    Only the stack depth and top are recorded, so each step is O(1).
+
+    >>> tracer = RingTracer(2)
+    >>> tracer("q0", "(", "f", [])
+    >>> tracer("q1", "(", "f", ["$"])
+    >>> tracer("q1", ")", "f", ["$", "("])
+    >>> tracer.dump()
+    current_state: q1, char: (, direction: f, depth: 1, top: '$'
+    current_state: q1, char: ), direction: f, depth: 2, top: '('
+    """
+
+    def __init__(self, size=32):
+        self.steps = deque(maxlen=size)
+
+    def __call__(self, state, char, direction, stack):
+        self.steps.append(
+            (state, char, direction, len(stack), stack[-1] if stack else None)
+        )
+
+    def dump(self):
+        for state, char, direction, depth, top in self.steps:
+            print(
+                f"current_state: {state}, char: {char}, direction: {direction}, depth: {depth}, top: {top!r}"
+            )
+
+
+class JsonlTracer:
+    """
+    Write every step, including the full stack, as one JSON object per line to `f`.
+
+    >>> import io
+    >>> f = io.StringIO()
+    >>> tracer = JsonlTracer(f)
+    >>> tracer("q1", "(", "f", ["$"])
+    >>> print(f.getvalue(), end="")
+    {"state": "q1", "char": "(", "direction": "f", "stack": ["$"]}
+    """
+
+    def __init__(self, f):
+        self.f = f
+
+    def __call__(self, state, char, direction, stack):
+        self.f.write(
+            json.dumps(
+                {
+                    "state": state,
+                    "char": char,
+                    "direction": direction,
+                    "stack": list(stack),
+                }
+            )
+        )
+        self.f.write("\n")
+
+
+def make_tracer(level, size=32, f=None):
+    """
+    Build the tracer for a trace level name, or None for "off".
+
+    Args:
+        level (str): One of TRACE_LEVELS.
+        size (int): Number of steps kept by the "ring" level.
+        f (file): Destination of the "jsonl" level.
+    """
+    if level == "off":
+        return None
+    if level == "print":
+        return PrintTracer()
+    if level == "ring":
+        return RingTracer(size)
+    if level == "jsonl":
+        return JsonlTracer(f)
+    raise ValueError(f"Invalid trace level: {level}")
@@ -1,4 +1,28 @@
+import codecs
 import csv
+import io
+import mmap
+import operator
+import os
+import stat
+import sys
+from typing import NamedTuple
+
+# Conventional state names used by the command line tools
+INITIAL_STATE = "q0"
+FINAL_STATES = ["q_accept", "qacc"]
+REJECT_STATES = ["q_reject", "qrej"]
+
+# Run budgets applied by the command line tools to machines with epsilon cycles
+DEFAULT_MAX_STEPS = 10_000_000
+DEFAULT_MAX_STACK = 1_000_000
+
+# Default number of characters (or bytes, for memory-mapped files) read at a time
+CHUNK_SIZE = 1 << 16
+
+
+# Columns of a .pda file
+COLUMNS = ["direction", "fromState", "inputChar", "stackChar", "toState", "stackChange"]
 
 
 def parse_transitions(file_contents: str):
@@ -15,53 +39,130 @@ def parse_transitions(file_contents: str):
     ... ''')
     {'f': {'q0': {('0', '1'): ('q1', ''), ('1', '1'): ('q1', '')}, 'q1': {('0', '1'): ('qacc', '')}}, 'b': {}}
     """
+    return parse_transitions_stream(io.StringIO(file_contents))
+
+
+def parse_transitions_file(path):
+    """
+    Parse a .pda file by path, reading it incrementally. See `parse_transitions_stream`.
+    """
+    with open(path, newline="") as f:
+        return parse_transitions_stream(f)
+
+
+def parse_transitions_stream(lines):
+    """
+    Parse PDA transitions from an iterable of CSV lines, such as an open file,
+    one row at a time. Extra memory is bounded by the size of the result: no
+    copy of the input is made, rows are plain lists rather than dicts, and
+    repeated state names share one string.
+    Returns the same dictionary as `parse_transitions`.
+
+    Raises:
+        ValueError: On an invalid row, naming its line number.
+
+    >>> parse_transitions_stream([
+    ...     "direction,fromState,inputChar,stackChar,toState,stackChange",
+    ...     "f,q0,ep,ep,q1,$",
+    ...     "",
+    ...     "f,q1,ep,$,qacc,ep",
+    ... ])
+    {'f': {'q0': {('', ''): ('q1', '$')}, 'q1': {('', '$'): ('qacc', '')}}, 'b': {}}
+    >>> parse_transitions_stream([
+    ...     "direction,fromState,inputChar,stackChar,toState,stackChange",
+    ...     "f,q0,ep,ep,q1,$",
+    ...     "x,q1,ep,$,qacc,ep",
+    ... ])
+    Traceback (most recent call last):
+        ...
+    ValueError: Invalid direction: x (line 3)
+    """
     # Initialize the transitions dictionary
     transitions: dict[str, dict[str, dict[tuple[str, str], tuple[str, str]]]] = {
         "f": {},
         "b": {},
     }
+    # One shared string per state name
+    names: dict[str, str] = {}
+
+    reader = csv.reader(lines)
+
+    # The header is the first non-blank row; it may list the columns in any order
+    for header in reader:
+        if any(field.strip() for field in header):
+            break
+    else:
+        return transitions
+    positions = {name.strip(): index for index, name in enumerate(header)}
+    indices = [positions.get(column) for column in COLUMNS]
+    if None in indices:
+        # Rows can never have a missing column, so always take the slow path
+        last_index = sys.maxsize
+    else:
+        last_index = max(indices)
+        get_fields = operator.itemgetter(*indices)
 
-    # Read the CSV contents
-    reader = csv.DictReader(file_contents.strip().splitlines())
     for row in reader:
-        # Extract and validate the values
-        from_state = row.get("fromState", "").strip()
-        direction = row.get("direction", "").strip()
-        input_char = row.get("inputChar", "").strip()
-        stack_char = row.get("stackChar", "").strip()
-        to_state = row.get("toState", "").strip()
-        stack_change = row.get("stackChange", "").strip()
+        # Skip blank lines
+        if not row or (len(row) == 1 and not row[0].strip()):
+            continue
+
+        # Extract and validate the values; missing columns and fields are empty
+        if len(row) > last_index:
+            direction, from_state, input_char, stack_char, to_state, stack_change = (
+                get_fields(row)
+            )
+        else:
+            direction, from_state, input_char, stack_char, to_state, stack_change = (
+                row[index] if index is not None and index < len(row) else ""
+                for index in indices
+            )
+        direction = direction.strip()
+        from_state = from_state.strip()
+        input_char = input_char.strip()
+        stack_char = stack_char.strip()
+        to_state = to_state.strip()
+        stack_change = stack_change.strip()
 
         if not from_state or not to_state:
-            raise ValueError(
-                f"Invalid states: fromState='{from_state}', toState='{to_state}'"
+            _row_error(
+                f"Invalid states: fromState='{from_state}', toState='{to_state}'",
+                reader,
             )
         if direction not in {"f", "b"}:
-            raise ValueError(f"Invalid direction: {direction}")
+            _row_error(f"Invalid direction: {direction}", reader)
         if input_char != "ep" and len(input_char) != 1:
-            raise ValueError(f"Invalid inputChar: {input_char}")
+            _row_error(f"Invalid inputChar: {input_char}", reader)
         if stack_char != "ep" and len(stack_char) != 1:
-            raise ValueError(f"Invalid stackChar: {stack_char}")
+            _row_error(f"Invalid stackChar: {stack_char}", reader)
         if stack_change != "ep" and len(stack_change) != 1:
-            raise ValueError(f"Invalid stackChange: {stack_change}")
+            _row_error(f"Invalid stackChange: {stack_change}", reader)
 
         # Normalize epsilon values
         input_char = input_char if input_char != "ep" else ""
         stack_char = stack_char if stack_char != "ep" else ""
         stack_change = stack_change if stack_change != "ep" else ""
 
+        from_state = names.setdefault(from_state, from_state)
+        to_state = names.setdefault(to_state, to_state)
+
         # Create the key and value for the transition
         key = (input_char, stack_char)
         value = (to_state, stack_change)
 
         # Add the transition, grouping by state
-        if from_state not in transitions[direction]:
-            transitions[direction][from_state] = {}
-        transitions[direction][from_state][key] = value
+        dir_transitions = transitions[direction]
+        if from_state not in dir_transitions:
+            dir_transitions[from_state] = {}
+        dir_transitions[from_state][key] = value
 
     return transitions
 
 
+def _row_error(message, reader):
+    raise ValueError(f"{message} (line {reader.line_num})")
+
+
 def validate(transitions, initial_state, final_states, reject_states):
     """
     Validate the PDA configuration.
@@ -141,7 +242,7 @@ def validate(transitions, initial_state, final_states, reject_states):
     >>> validate(transitions, initial_state, final_states, reject_states)
     Traceback (most recent call last):
         ...
-    ValueError: Final state 'q2' is not defined in transitions.
+    ValueError: No final states defined in transitions (['q2']).
 
     >>> transitions = {
     ...     "f": {
@@ -155,9 +256,7 @@ def validate(transitions, initial_state, final_states, reject_states):
     >>> final_states = ["q1"]
     >>> reject_states = ["q2"]
     >>> validate(transitions, initial_state, final_states, reject_states)
-    Traceback (most recent call last):
-        ...
-    ValueError: Reject state 'q2' is not defined in transitions.
+    True
 
     >>> transitions = {
     ...     "f": {
@@ -176,6 +275,81 @@ def validate(transitions, initial_state, final_states, reject_states):
         ...
     ValueError: Missing reverse transition for forward transition: 'q0' => 'q1' on input 'a' with stack ''.
     """
+    report = validation_report(transitions, initial_state, final_states, reject_states)
+    if not report:
+        raise ValueError(report.violations[0].message)
+
+    return True
+
+
+class Violation(NamedTuple):
+    """
+    One problem found by `validation_report`.
+
+    kind is one of "undefined_state", "missing_reverse" or "ambiguous_reverse".
+    """
+
+    kind: str
+    message: str
+
+
+class ValidationReport:
+    """
+    Every violation found in a machine. A report is truthy when the machine is valid.
+    """
+
+    def __init__(self, violations: list[Violation]):
+        self.violations = violations
+
+    def __bool__(self):
+        return not self.violations
+
+    def __str__(self):
+        return "\n".join(violation.message for violation in self.violations)
+
+    def __repr__(self):
+        return f"ValidationReport({self.violations!r})"
+
+    def to_dict(self):
+        return {
+            "valid": not self.violations,
+            "violations": [violation._asdict() for violation in self.violations],
+        }
+
+
+def validation_report(
+    transitions, initial_state, final_states, reject_states
+) -> ValidationReport:
+    """
+    Check the PDA configuration like `validate`, but collect every violation instead of stopping at the first.
+
+    Each forward rule is checked with one lookup of its reverse, keyed by
+    (to_state, input, stack_change) in the backward transitions, so validation
+    is linear in the number of transitions. A machine is also irreversible when
+    two forward rules would need the same backward rule to undo them.
+
+    >>> transitions = {
+    ...     "f": {
+    ...         "q0": {("a", ""): ("q1", "X"), ("b", ""): ("q2", "X")},
+    ...         "q2": {("a", ""): ("q1", "X")},
+    ...     },
+    ...     "b": {
+    ...         "q1": {("a", "X"): ("q0", "")},
+    ...     },
+    ... }
+    >>> report = validation_report(transitions, "q0", ["q3"], [])
+    >>> bool(report)
+    False
+    >>> print(report)
+    No final states defined in transitions (['q3']).
+    Missing reverse transition for forward transition: 'q0' => 'q2' on input 'b' with stack ''.
+    Ambiguous reverse transition: 'q0' => 'q1' and 'q2' => 'q1' on input 'a' both push 'X'.
+    Missing reverse transition for forward transition: 'q2' => 'q1' on input 'a' with stack ''.
+    >>> [violation.kind for violation in report.violations]
+    ['undefined_state', 'missing_reverse', 'ambiguous_reverse', 'missing_reverse']
+    """
+    violations = []
+
     # Collect all states from transitions
     states = set()
     for direction, dir_transitions in transitions.items():
@@ -186,59 +360,131 @@ def validate(transitions, initial_state, final_states, reject_states):
 
     # Check that the initial state exists
     if initial_state not in states:
-        raise ValueError(
-            f"Initial state '{initial_state}' is not defined in transitions."
+        violations.append(
+            Violation(
+                "undefined_state",
+                f"Initial state '{initial_state}' is not defined in transitions.",
+            )
         )
 
     # Check that at least one final state exists (but not necessarily all)
-    has_final_state = False
-    for state in final_states:
-        if state in states:
-            has_final_state = True
-            break
-    if not has_final_state:
-        raise ValueError(f"No final states defined in transitions ({final_states}).")
+    if not any(state in states for state in final_states):
+        violations.append(
+            Violation(
+                "undefined_state",
+                f"No final states defined in transitions ({list(final_states)}).",
+            )
+        )
 
     # skip check for reject as it can be implicit
 
-    # Check for ambiguous transitions in deterministic directions
-    for direction, dir_transitions in transitions.items():
-        for state, transitions_for_state in dir_transitions.items():
-            seen_conditions = set()
-            for input_char, stack_char in transitions_for_state.keys():
-                if (input_char, stack_char) in seen_conditions:
-                    raise ValueError(
-                        f"Ambiguous transitions detected in state '{state}' "
-                        f"for input '{input_char}' and stack '{stack_char}' in direction '{direction}'."
-                    )
-                seen_conditions.add((input_char, stack_char))
-
-    # Check reversibility
-    for forward_state, forward_transitions in transitions["f"].items():
+    # Check reversibility. The backward transitions are already indexed by
+    # state and (inputChar, stackChar), so the reverse of a forward rule
+    # p -(a, X)-> q pushing Y is the single entry b[q][(a, Y)] == (p, X)
+    backward = transitions.get("b", {})
+    undone_by = {}
+    for forward_state, forward_transitions in transitions.get("f", {}).items():
         for (input_char, stack_char), (
             to_state,
             stack_change,
         ) in forward_transitions.items():
-            # Locate the reverse transition
-            reverse_transitions = transitions["b"].get(to_state, {})
-            reverse_found = False
-            for (rev_input_char, rev_stack_char), (
-                rev_to_state,
-                rev_stack_change,
-            ) in reverse_transitions.items():
-                if (
-                    rev_to_state == forward_state
-                    and rev_stack_change == stack_char
-                    and rev_stack_char == stack_change
-                    and rev_input_char == input_char
-                ):
-                    reverse_found = True
-                    break
-
-            if not reverse_found:
-                raise ValueError(
-                    f"Missing reverse transition for forward transition: "
-                    f"'{forward_state}' => '{to_state}' on input '{input_char}' with forward stack change '{stack_char}'."
+            reverse_key = (to_state, input_char, stack_change)
+            if reverse_key in undone_by:
+                other_state = undone_by[reverse_key]
+                violations.append(
+                    Violation(
+                        "ambiguous_reverse",
+                        f"Ambiguous reverse transition: '{other_state}' => '{to_state}' "
+                        f"and '{forward_state}' => '{to_state}' on input '{input_char}' "
+                        f"both push '{stack_change}'.",
+                    )
                 )
+            else:
+                undone_by[reverse_key] = forward_state
 
-    return True
+            reverse = backward.get(to_state, {}).get((input_char, stack_change))
+            if reverse != (forward_state, stack_char):
+                violations.append(
+                    Violation(
+                        "missing_reverse",
+                        f"Missing reverse transition for forward transition: "
+                        f"'{forward_state}' => '{to_state}' on input '{input_char}' with stack '{stack_char}'.",
+                    )
+                )
+
+    return ValidationReport(violations)
+
+
+def _mmap_file(f):
+    """
+    Memory-map `f` if it is a non-empty regular file, otherwise return None.
+    """
+    try:
+        fd = f.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+    st = os.fstat(fd)
+    if not stat.S_ISREG(st.st_mode) or st.st_size == 0:
+        return None
+    return mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+
+
+def _is_empty_file(f):
+    try:
+        st = os.fstat(f.fileno())
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return False
+    return stat.S_ISREG(st.st_mode) and st.st_size == 0
+
+
+def read_chunks(source, chunk_size=CHUNK_SIZE, reverse=False):
+    """
+    Yield the contents of `source` as string chunks of bounded size.
+
+    Args:
+        source: A file object or an iterable of strings.
+            Regular files are memory-mapped and decoded incrementally.
+        chunk_size (int): Maximum size of a chunk (bytes for memory-mapped files).
+        reverse (bool): Yield the contents back to front, with each chunk reversed.
+            Only supported for memory-mapped UTF-8 files.
+
+    >>> list(read_chunks(io.StringIO("abcde"), chunk_size=2))
+    ['ab', 'cd', 'e']
+    >>> list(read_chunks(["ab", "c"]))
+    ['ab', 'c']
+    """
+    mm = _mmap_file(source)
+    if mm is None:
+        if reverse:
+            if _is_empty_file(source):
+                return
+            raise ValueError("Reverse reading needs a regular file.")
+        if hasattr(source, "read"):
+            yield from iter(lambda: source.read(chunk_size), "")
+        else:
+            yield from source
+        return
+
+    encoding = getattr(source, "encoding", None) or "utf-8"
+    with mm:
+        if reverse:
+            if codecs.lookup(encoding).name != "utf-8":
+                raise ValueError(f"Reverse reading is not supported for {encoding}.")
+            end = len(mm)
+            while end > 0:
+                start = max(0, end - chunk_size)
+                # Never split a multi-byte character: back up past continuation bytes
+                while start > 0 and mm[start] & 0xC0 == 0x80:
+                    start -= 1
+                yield mm[start:end].decode(encoding)[::-1]
+                end = start
+            return
+
+        decoder = codecs.getincrementaldecoder(encoding)()
+        for start in range(0, len(mm), chunk_size):
+            chunk = decoder.decode(mm[start : start + chunk_size])
+            if chunk:
+                yield chunk
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
@@ -0,0 +1,392 @@
+#! /usr/bin/env python3
+
+import argparse
+import os
+import random
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+from batch import chunked, read_inputs
+from machine import BACKWARD_INITIAL_STATE, Machine
+from pda import SimulationLimitError
+from stacks import STACK_BACKENDS
+
+# Generators of --generate: random strings over the input alphabet, or
+# strings the machine reads all the way through
+GENERATORS = ["walk", "random"]
+
+
+class Failure(NamedTuple):
+    """
+    An input whose round trip failed, why, and a minimized input that still fails.
+    """
+
+    input: str
+    reason: str
+    counterexample: str
+    counterexample_reason: str
+
+
+def round_trip(forward, backward, input_string):
+    """
+    Run `input_string` forward on the run `forward`, then run the input it
+    consumed backward, reversed, on the run `backward` from the configuration
+    the forward run ended in. Returns None if the backward run reads all of it
+    and ends in the forward run's initial state with an empty stack, and
+    otherwise a description of what went wrong.
+
+    Inputs that are rejected forward are checked too, up to where the
+    forward run stopped. `backward` must have no reject states, as it starts
+    from wherever the forward run stopped; see `round_trip_runs`.
+
+    >>> transitions = {
+    ...     "f": {"q0": {("a", ""): ("q1", "X")}, "q1": {("b", "X"): ("qacc", "")}},
+    ...     "b": {"q1": {("a", "X"): ("q0", "")}, "qacc": {("b", ""): ("q1", "Y")}},
+    ... }
+    >>> forward, backward = round_trip_runs(Machine(transitions))
+    >>> print(round_trip(forward, backward, "a"))
+    None
+    >>> round_trip(forward, backward, "ab")
+    "read 1 of 2 characters backward, stopping in state 'q1' with stack ['Y']"
+    """
+    try:
+        forward.reset()
+        forward.simulate(input_string, "f")
+        consumed = forward.position
+        backward.restore(
+            forward.checkpoint()._replace(position=0, steps=0, halted=False)
+        )
+        backward.feed(input_string[:consumed][::-1], "b")
+        state, stack, _ = backward.finish("b")
+    except SimulationLimitError as e:
+        return str(e)
+
+    initial_state = forward.machine.initial_state
+    if backward.position != consumed:
+        return (
+            f"read {backward.position} of {consumed} characters backward, "
+            f"stopping in state '{state}' with stack {list(stack)}"
+        )
+    if state != initial_state:
+        return f"ended backward in state '{state}' instead of '{initial_state}'"
+    if len(stack):
+        return f"ended backward with stack {list(stack)} instead of an empty one"
+    return None
+
+
+def round_trip_runs(machine, **pda_options):
+    """
+    Return the forward and backward runs `round_trip` needs for a machine.
+    """
+    backward = Machine(
+        machine.transitions,
+        BACKWARD_INITIAL_STATE,
+        [machine.initial_state],
+        [],
+        table=machine.table,
+    )
+    return machine.run(**pda_options), backward.run(**pda_options)
+
+
+def shrink(input_string, fails):
+    """
+    Return a shortest-found input that still `fails`, by deleting ever smaller
+    chunks of characters (delta debugging). No single character can be
+    deleted from the result without it passing.
+
+    >>> shrink("xxaxxbxx", lambda s: "a" in s and "b" in s)
+    'ab'
+    """
+    granularity = 2
+    while input_string:
+        size = max(len(input_string) // granularity, 1)
+        for start in range(0, len(input_string), size):
+            candidate = input_string[:start] + input_string[start + size :]
+            if fails(candidate):
+                input_string = candidate
+                granularity = max(granularity - 1, 2)
+                break
+        else:
+            if size == 1:
+                break
+            granularity = min(granularity * 2, len(input_string))
+    return input_string
+
+
+def generate_inputs(run, count, max_length, rng, walk=True):
+    """
+    Return `count` inputs of up to `max_length` characters over the input
+    alphabet of the run's machine. Random inputs are usually rejected within a
+    few characters; with `walk`, each next character is one the machine can
+    read from where the previous ones left it, so the inputs are read all the
+    way through and the round trip covers all of them.
+
+    >>> transitions = {"f": {"q0": {("a", ""): ("q0", "A"), ("b", "A"): ("q0", "")}}, "b": {}}
+    >>> generate_inputs(Machine(transitions).run(), 3, 6, random.Random(2))
+    ['aaabab', 'ababaa', 'a']
+    """
+    alphabet = [symbol for symbol in run.table.input_symbols if symbol]
+    inputs = []
+    for _ in range(count):
+        length = rng.randint(0, max_length)
+        if not walk or not alphabet:
+            inputs.append("".join(rng.choice(alphabet or [""]) for _ in range(length)))
+            continue
+        run.reset()
+        run.direction = "f"
+        chars = []
+        while len(chars) < length:
+            saved = run.checkpoint()
+            for char in rng.sample(alphabet, len(alphabet)):
+                if run.feed(char, "f"):
+                    chars.append(char)
+                    break
+                run.restore(saved)
+            else:
+                break
+        inputs.append("".join(chars))
+    return inputs
+
+
+# Per-worker runs, started once by _init_worker
+_worker_runs = ()
+
+
+def _init_worker(machine, pda_options):
+    global _worker_runs
+    _worker_runs = round_trip_runs(machine, **pda_options)
+
+
+def _verify_task(task):
+    """
+    Check the inputs of a task: ("inputs", [input, ...]) or
+    ("generate", seed, index, count, max_length, walk).
+    Returns how many inputs were checked and the failures.
+    """
+    forward, backward = _worker_runs
+    if task[0] == "generate":
+        _, seed, index, count, max_length, walk = task
+        rng = random.Random(f"{seed}:{index}")
+        input_strings = generate_inputs(forward, count, max_length, rng, walk)
+    else:
+        input_strings = task[1]
+
+    failures = []
+    for input_string in input_strings:
+        reason = round_trip(forward, backward, input_string)
+        if reason is None:
+            continue
+        counterexample = shrink(
+            input_string,
+            lambda candidate: round_trip(forward, backward, candidate) is not None,
+        )
+        failures.append(
+            Failure(
+                input_string,
+                reason,
+                counterexample,
+                round_trip(forward, backward, counterexample),
+            )
+        )
+    return len(input_strings), failures
+
+
+def _verify_tasks(machine, tasks, workers, pda_options):
+    if workers <= 1:
+        _init_worker(machine, pda_options)
+        for task in tasks:
+            yield _verify_task(task)
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(machine, pda_options),
+    ) as executor:
+        pending = deque()
+        for task in tasks:
+            pending.append(executor.submit(_verify_task, task))
+            # Bound the number of tasks in flight to keep memory flat
+            if len(pending) >= workers * 4:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def verify_many(machine, inputs, workers=None, chunksize=256, **pda_options):
+    """
+    Check the round trip (see `round_trip`) of every input string, fanned out
+    to worker processes in chunks of `chunksize` as `batch.simulate_many`
+    does. Yields (inputs checked, failures) per chunk, in input order, so
+    `inputs` can be an unbounded iterator.
+
+    >>> machine = Machine.from_file(os.path.join(os.path.dirname(__file__), "examples", "counting.pda"), use_cache=False)
+    >>> [checked for checked, failures in verify_many(machine, ["(())", "())", ""], workers=1)]
+    [3]
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    tasks = (("inputs", chunk) for chunk in chunked(inputs, chunksize))
+    yield from _verify_tasks(machine, tasks, workers, pda_options)
+
+
+def verify_generated(
+    machine,
+    count,
+    max_length,
+    seed=0,
+    walk=True,
+    workers=None,
+    chunksize=256,
+    **pda_options,
+):
+    """
+    Like `verify_many` on `count` inputs from `generate_inputs`, generated
+    by the workers themselves. The inputs only depend on `seed` and `chunksize`.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    tasks = (
+        ("generate", seed, index, min(chunksize, count - start), max_length, walk)
+        for index, start in enumerate(range(0, count, chunksize))
+    )
+    yield from _verify_tasks(machine, tasks, workers, pda_options)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        usage="python3 verify.py <machine.pda> (--corpus <file|-> | --generate N)",
+        description="Check that running each input forward and then backward "
+        "returns a reversible PDA to its initial state with an empty stack.",
+    )
+    parser.add_argument("machine", help="the .pda file")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument(
+        "--corpus",
+        metavar="FILE",
+        help="check every line of FILE (- for stdin) as an input",
+    )
+    source.add_argument(
+        "--generate", type=int, metavar="N", help="check N generated inputs"
+    )
+    parser.add_argument(
+        "--generator",
+        choices=GENERATORS,
+        default="walk",
+        help="generate inputs the machine reads all the way through (walk, "
+        "the default) or random strings over its alphabet",
+    )
+    parser.add_argument(
+        "--max-length",
+        type=int,
+        default=64,
+        metavar="L",
+        help="longest generated input (default: 64)",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="seed of the generated inputs"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="worker processes (default: CPU count)",
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=256,
+        help="inputs sent to a worker at a time (default: 256)",
+    )
+    parser.add_argument(
+        "--max-failures",
+        type=int,
+        metavar="K",
+        help="stop after K failing inputs (default: check every input)",
+    )
+    parser.add_argument(
+        "--max-steps",
+        type=int,
+        metavar="N",
+        help="abort a run after N steps (default: as in rePDAsim.py)",
+    )
+    parser.add_argument(
+        "--max-stack",
+        type=int,
+        metavar="N",
+        help="abort a run once the stack is deeper than N (default: as in rePDAsim.py)",
+    )
+    parser.add_argument("--stack", choices=STACK_BACKENDS, default="list")
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="always parse machine files instead of using the compiled-machine cache",
+    )
+    parser.add_argument("--cache-dir", metavar="DIR", help="compiled-machine cache")
+    args = parser.parse_args(argv)
+
+    if args.generate is not None and args.generate < 0:
+        parser.error("--generate takes a count of inputs.")
+    if args.max_length < 0 or args.chunksize < 1:
+        parser.error("--max-length and --chunksize cannot be negative.")
+    return args
+
+
+def main():
+    args = parse_args()
+    machine = Machine.from_file(
+        args.machine, cache_dir=args.cache_dir, use_cache=not args.no_cache
+    )
+
+    max_steps, max_stack = machine.default_budgets(args.max_steps, args.max_stack)
+    options = {
+        "max_steps": max_steps,
+        "max_stack": max_stack,
+        "stack_backend": args.stack,
+    }
+
+    f = None
+    if args.corpus is not None:
+        f = sys.stdin if args.corpus == "-" else open(args.corpus)
+        chunks = verify_many(
+            machine, read_inputs(f), args.workers, args.chunksize, **options
+        )
+    else:
+        chunks = verify_generated(
+            machine,
+            args.generate,
+            args.max_length,
+            seed=args.seed,
+            walk=args.generator == "walk",
+            workers=args.workers,
+            chunksize=args.chunksize,
+            **options,
+        )
+
+    checked = failed = 0
+    try:
+        for count, failures in chunks:
+            checked += count
+            if args.max_failures is not None:
+                failures = failures[: args.max_failures - failed]
+            for failure in failures:
+                failed += 1
+                print(f"Round trip failed for {failure.input!r}: {failure.reason}")
+                print(
+                    f"\tMinimized: {failure.counterexample!r}: "
+                    f"{failure.counterexample_reason}"
+                )
+            if args.max_failures is not None and failed >= args.max_failures:
+                break
+    finally:
+        if f is not None and f is not sys.stdin:
+            f.close()
+
+    print(f"Checked {checked} inputs, {failed} round trips failed.")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()